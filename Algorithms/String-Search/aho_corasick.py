@@ -0,0 +1,161 @@
+'''
+    Naive Aho-Corasick implementation for searching many patterns at once in a string
+    Paper: Alfred V. Aho and Margaret J. Corasick. 1975. Efficient string matching: an aid to bibliographic search. Commun. ACM 18, 6 (June 1975), 333-340.
+    It is the kmp_prefix_func of knuth_morris_prat.py generalized from a single pattern (a chain of states)
+    to a trie of patterns. fail[q] is the longest proper suffix of the string spelled by q that is also
+    a node of the trie, exactly as arr[q-1] is the longest proper suffix of P_{q} that is a prefix of P.
+    The text is scanned once, so the cost is O(n + matches) instead of O(n*k) for k calls to search_kmp.
+'''
+
+from collections import deque
+
+from results import collect
+
+
+class AhoCorasick():
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.lens = [len(p) for p in self.patterns]
+        self.goto = [{}] # goto[q][c] = child of q through c
+        self.fail = [0]
+        self.out = [[]]  # ids of the patterns that end exactly at node q
+        self.dict_link = [0] # next node in the fail chain with a non empty out, 0 if none
+        for pid, p in enumerate(self.patterns):
+            assert len(p) > 0
+            self.insert(pid, p)
+        self.build_failure()
+
+    def insert(self, pid, p):
+        q = 0
+        for c in p:
+            nxt = self.goto[q].get(c)
+            if nxt == None:
+                nxt = len(self.goto)
+                self.goto[q][c] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+                self.dict_link.append(0)
+            q = nxt
+        self.out[q].append(pid)
+
+    # Breadth first, so the failure of every shorter node is already known.
+    # Same loop as kmp_prefix_func: go back through the failures until
+    # someone can be extended with the character c.
+    def build_failure(self):
+        goto = self.goto
+        fail = self.fail
+        queue = deque(goto[0].values())
+        while queue:
+            r = queue.popleft()
+            for c, s in goto[r].items():
+                queue.append(s)
+                k = fail[r]
+                while k > 0 and c not in goto[k]:
+                    k = fail[k]
+                k = goto[k].get(c, 0)
+                fail[s] = k
+                self.dict_link[s] = k if self.out[k] else self.dict_link[k]
+
+    def next_state(self, q, c):
+        goto = self.goto
+        while q > 0 and c not in goto[q]:
+            q = self.fail[q]
+        return goto[q].get(c, 0)
+
+    # (pattern_id, position) pairs ordered by the position where the match ends
+    def iter(self, t, chunk_size = 1 << 16):
+        stream = AhoCorasickStream(self)
+        for start in range(0, len(t), chunk_size):
+            for hit in stream.feed(t[start:start+chunk_size]):
+                yield hit
+
+    def search(self, t, first_k = None, out = None):
+        return collect(self.iter(t), first_k, out)
+
+
+'''
+    The scan of the text. The state survives between calls so the text can also
+    arrive in chunks (network reads, blocks of a file). Many streams can share one automaton,
+    every stream only keeps its node and its offset.
+'''
+class AhoCorasickStream():
+
+    def __init__(self, automaton, q = 0, offset = 0):
+        self.automaton = automaton
+        self.q = q
+        self.offset = offset # absolute position of the first char of the next chunk
+
+    # returns the (pattern_id, position) pairs of the matches ending inside chunk
+    def feed(self, chunk):
+        ac = self.automaton
+        goto = ac.goto
+        fail = ac.fail
+        out = ac.out
+        dict_link = ac.dict_link
+        lens = ac.lens
+        base = self.offset + 1
+        x = []
+        q = self.q
+        for i, c in enumerate(chunk):
+            while q > 0 and c not in goto[q]:
+                q = fail[q]
+            q = goto[q].get(c, 0)
+            o = q if out[q] else dict_link[q]
+            while o > 0:
+                for pid in out[o]:
+                    x.append((pid, base + i - lens[pid]))
+                o = dict_link[o]
+        self.q = q
+        self.offset = self.offset + len(chunk)
+        return x
+
+
+def search_aho_corasick(t, patterns, first_k = None, out = None):
+    return AhoCorasick(patterns).search(t, first_k, out)
+
+
+def benchmark(n = 200000, k = 300, seed = 1):
+    import random
+    import time
+    from knuth_morris_prat import search_kmp
+
+    rnd = random.Random(seed)
+    alphabet = 'abcdefghijklmnopqrstuvwxyz0123456789.:/-'
+    t = ''.join(rnd.choice(alphabet) for _ in range(n))
+    patterns = []
+    for _ in range(k):
+        m = rnd.randint(4, 12)
+        if rnd.random() < 0.5: # half of them are present in the text
+            pos = rnd.randint(0, n - m)
+            patterns.append(t[pos:pos+m])
+        else:
+            patterns.append(''.join(rnd.choice(alphabet) for _ in range(m)))
+
+    start = time.perf_counter()
+    ac = AhoCorasick(patterns)
+    built = time.perf_counter()
+    res_ac = ac.search(t)
+    end = time.perf_counter()
+
+    res_kmp = []
+    start_kmp = time.perf_counter()
+    for pid, p in enumerate(patterns):
+        res_kmp.extend((pid, pos) for pos in search_kmp(t, p))
+    end_kmp = time.perf_counter()
+
+    assert sorted(res_ac) == sorted(res_kmp)
+    print('text = ' + str(n) + ' chars, patterns = ' + str(k) + ', matches = ' + str(len(res_ac)))
+    print('aho-corasick build = %.3f s scan = %.3f s' % (built - start, end - built))
+    print('kmp per pattern     = %.3f s' % (end_kmp - start_kmp))
+
+
+if __name__ == "__main__":
+
+    t = 'ABABACABAACABAABBBAABABACAAACABABACCAACABACACBACBABCBAACBACCBBAAACBBCACABABBACBBABA'
+    patterns = ['ACABACA', 'ABA', 'BAC', 'CBBA']
+    for pid, pos in search_aho_corasick(t, patterns):
+        print('Pattern ' + patterns[pid] + ' found at position = ' + str(pos))
+
+    benchmark()
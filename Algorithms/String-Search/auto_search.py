@@ -0,0 +1,205 @@
+'''
+    Choose the matcher from the pattern and the text instead of guessing.
+    The decision looks at:
+        - pattern length m
+        - alphabet size, the distinct symbols of the first bytes of the text (or of the pattern)
+        - periodicity of the pattern, period = m - kmp_prefix_func(p)[m-1]. A pattern with
+          period <= m/2 (e.g., ABABABAB) makes Horspool/Sunday quadratic on periodic texts,
+          Two-Way stays linear.
+        - text size n, for tiny texts the cheapest preprocessing wins, for long bytes texts
+          the NumPy packed filter wins on short patterns.
+    The per length choice for small and large alphabets, and the other thresholds, come from
+    calibrate(), which times the matchers on the benchmark corpora on this host and saves them as JSON.
+    Without a calibration file the defaults below are used.
+'''
+
+import json
+import os
+import random
+import time
+
+from compiled import compile, algorithms, algorithms_bytes
+from knuth_morris_prat import kmp_prefix_func
+from results import collect
+
+try:
+    from packed_filter import search_packed
+except ImportError: # numpy is not installed
+    search_packed = None
+
+
+thresholds_path = os.environ.get('STRING_SEARCH_THRESHOLDS',
+    os.path.join(os.path.expanduser('~'), '.cache', 'string_search', 'auto_search.json'))
+
+default_thresholds = {
+    'version': 1,
+    'small_alphabet': 16,   # alphabets up to this size use the 'small' table (DNA, hex)
+    'sample_size': 4096,    # bytes of the text used to estimate the alphabet
+    'tiny_text': 256,       # below this text size preprocessing dominates
+    'periodic_min_m': 16,   # periodic patterns at least this long go to two_way
+    'packed_max_m': 15,
+    'packed_min_n': 4096,
+    # [m, algorithm], the entry with the biggest m <= len(p) is used
+    'tables': {
+        'small': [[1, 'sunday'], [8, 'horspool'], [32, 'boyer_moore']],
+        'large': [[1, 'sunday'], [16, 'horspool']],
+    },
+}
+
+thresholds = None
+
+
+def load_thresholds(path = None):
+    global thresholds
+    thresholds = dict(default_thresholds)
+    try:
+        with open(path or thresholds_path) as f:
+            saved = json.load(f)
+        if saved.get('version') == default_thresholds['version']:
+            thresholds.update(saved)
+    except (IOError, ValueError):
+        pass
+    return thresholds
+
+def save_thresholds(values, path = None):
+    path = path or thresholds_path
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(values, f, indent=1)
+    os.replace(tmp, path)
+
+
+def period(p):
+    return len(p) - kmp_prefix_func(p)[-1]
+
+def alphabet_size(p, t = None, sample_size = 4096):
+    symbols = set(p)
+    if t != None:
+        symbols.update(t[:sample_size])
+    return len(symbols)
+
+def choose(p, t = None, n = None):
+    th = thresholds or load_thresholds()
+    m = len(p)
+    if n == None:
+        n = len(t) if t != None else 0
+    is_bytes = isinstance(p, (bytes, bytearray))
+    if is_bytes and search_packed != None and m <= th['packed_max_m'] and n >= th['packed_min_n']:
+        return 'packed'
+    if m == 1 or n < th['tiny_text']:
+        return 'sunday'
+    if m >= th['periodic_min_m'] and 2 * period(p) <= m:
+        return 'two_way'
+    sigma = alphabet_size(p, t, th['sample_size'])
+    table = th['tables']['small' if sigma <= th['small_alphabet'] else 'large']
+    algorithm = table[0][1]
+    for min_m, name in table:
+        if m >= min_m:
+            algorithm = name
+    if is_bytes and algorithm not in algorithms_bytes:
+        algorithm = 'horspool'
+    return algorithm
+
+def search(t, p, first_k = None, out = None):
+    algorithm = choose(p, t)
+    if algorithm == 'packed':
+        if first_k != None:
+            return collect(search_packed(t, p), first_k, out)
+        return search_packed(t, p, out = out)
+    return compile(p, algorithm).search(t, first_k, out)
+
+
+'''
+    Calibration: time every matcher on a small and a large alphabet corpus for a sweep of
+    pattern lengths, keep the fastest per length, and measure where the periodic patterns
+    and the packed filter start to pay off.
+'''
+def fastest(t, patterns, names):
+    best = None
+    for name in names:
+        pre_process, search_func = algorithms[name]
+        start = time.perf_counter()
+        for p in patterns:
+            search_func(t, p, *pre_process(p))
+        elapsed = time.perf_counter() - start
+        if best == None or elapsed < best[0]:
+            best = (elapsed, name)
+    return best[1]
+
+def compress_table(rows):
+    table = []
+    for m, name in rows:
+        if not table or table[-1][1] != name:
+            table.append([m, name])
+    table[0][0] = 1
+    return table
+
+def calibrate(size = 1 << 17, lengths = (2, 4, 8, 16, 32, 64, 128), patterns_per_length = 3, path = None, save = True, seed = 1):
+    from benchmark import make_corpus, pick_patterns
+
+    rnd = random.Random(seed)
+    values = dict(default_thresholds)
+    names = sorted(algorithms)
+    tables = {}
+    for table, kind in (('small', 'dna'), ('large', 'english')):
+        t = make_corpus(kind, size, rnd)
+        rows = []
+        for m in lengths:
+            rows.append((m, fastest(t, pick_patterns(t, m, patterns_per_length, rnd), names)))
+        tables[table] = compress_table(rows)
+    values['tables'] = tables
+
+    # periodic patterns over a periodic text: first length where two_way beats the table choice
+    values['periodic_min_m'] = lengths[-1] * 2
+    for m in lengths:
+        if m < 4:
+            continue
+        unit = 'ACG'[:min(3, m // 2)] # a unit of at most m/2 chars, so p has period <= m/2
+        t = (unit * (size // len(unit) + 1))[:size]
+        p = (unit * (m // len(unit) + 1))[:m]
+        assert 2 * period(p) <= m
+        table_choice = [name for min_m, name in tables['small'] if m >= min_m][-1]
+        if fastest(t, [p], [table_choice, 'two_way']) == 'two_way':
+            values['periodic_min_m'] = m
+            break
+
+    # packed filter against the best bytes matcher on random bytes
+    if search_packed != None:
+        values['packed_max_m'] = 0
+        t = bytes(rnd.getrandbits(8) for _ in range(size))
+        for m in lengths:
+            if m > 15:
+                break
+            p = t[size // 2:size // 2 + m]
+            start = time.perf_counter()
+            search_packed(t, p)
+            packed = time.perf_counter() - start
+            pre_process, search_func = algorithms_bytes['sunday']
+            start = time.perf_counter()
+            search_func(t, p, *pre_process(p))
+            if packed < time.perf_counter() - start:
+                values['packed_max_m'] = m
+
+    if save:
+        save_thresholds(values, path)
+    global thresholds
+    thresholds = values
+    return values
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'calibrate':
+        values = calibrate()
+        print(json.dumps(values, indent=1))
+        print('saved to ' + thresholds_path)
+    else:
+        t = 'AIABBABABRQMYOAABBBBABABYOSGBBGTVBHABBABABSUJKSKKHKJABBABBABABABAYRQMYOIUHKJHJHSDASDASDNIAURTO ABBABABNLK' * 10
+        for p in ['ABBABAB', 'AB', 'ABABABABABABABABAB', 'SKKHKJABBABBABABABAYRQMYOIUHKJHJHSDASDASD']:
+            print(p + ' -> ' + choose(p, t) + ' ' + str(len(search(t, p))) + ' matches')
+        t = t.encode() * 10
+        print('ABBA (bytes) -> ' + choose(b'ABBA', t))
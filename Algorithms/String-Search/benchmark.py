@@ -0,0 +1,168 @@
+'''
+    Benchmark of the string matchers of this directory on different kinds of text.
+    Corpora: dna (4 symbols), english (zipf distributed words), binary (random bytes, as latin-1 str)
+    and hexdump (packets written in hex like the payload test of two_way_matching.py), or any
+    file given with --corpus name=path.
+    For every corpus, pattern length and algorithm it measures:
+        - preprocessing time (building the tables once)
+        - search time with the tables already built and the throughput in MB/s
+        - text characters read per text byte. Every read of t[i] is followed by a comparison
+          (or by a shift table lookup), so it is the usual "character comparisons" count of the
+          literature, measured by wrapping the text in CountingText.
+    The results are printed as a table and can be saved as JSON (--json) to track regressions.
+'''
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from compiled import algorithms
+from karp_rabin import search_rabin_karp
+
+
+matchers = dict(algorithms)
+matchers['rabin_karp'] = (lambda p: (), search_rabin_karp)
+
+corpus_kinds = ['dna', 'english', 'binary', 'hexdump']
+
+words = ('the of and to a in is it you that he was for on are with as his they be at one have this from '
+         'or had by hot word but what some we can out other were all there when up use your how said an '
+         'each she which do their time if will way about many then them write would like so these her long '
+         'make thing see him two has look more day could go come did number sound no most people my over').split()
+
+
+class CountingText():
+
+    def __init__(self, t):
+        self.t = t
+        self.reads = 0
+
+    def __len__(self):
+        return len(self.t)
+
+    def __getitem__(self, i):
+        x = self.t[i]
+        self.reads = self.reads + (len(x) if isinstance(i, slice) else 1) # block readers copy slices
+        return x
+
+
+def make_corpus(kind, size, rnd):
+    if kind == 'dna':
+        return ''.join(rnd.choice('ACGT') for _ in range(size))
+    if kind == 'english':
+        weights = [1.0 / (r + 1) for r in range(len(words))] # zipf
+        out = []
+        length = 0
+        while length < size:
+            w = rnd.choices(words, weights)[0]
+            out.append(w)
+            length = length + len(w) + 1
+        return ' '.join(out)[:size]
+    if kind == 'binary':
+        return bytes(rnd.getrandbits(8) for _ in range(size)).decode('latin-1')
+    if kind == 'hexdump':
+        # ethernet + ip + tcp headers with a few varying fields followed by a random payload
+        out = []
+        length = 0
+        while length < size:
+            header = ('67efbad0c5b8f279a64baabbe34' + '%04x' % rnd.getrandbits(16) + '0800450005dc'
+                      + '%04x' % rnd.getrandbits(16) + '40003f06' + '%08x' % rnd.getrandbits(32) + 'c0a80864')
+            payload = '%x' % rnd.getrandbits(4 * rnd.randint(64, 1400))
+            out.append(header + payload)
+            length = length + len(header) + len(payload)
+        return ''.join(out)[:size]
+    raise ValueError('unknown corpus ' + kind)
+
+def load_corpus(path):
+    with open(path, 'rb') as f:
+        return f.read().decode('latin-1')
+
+def pick_patterns(t, m, count, rnd):
+    return [t[pos:pos+m] for pos in (rnd.randint(0, len(t) - m) for _ in range(count))]
+
+
+def bench(t, p, algorithm, counting_size):
+    pre_process, search = matchers[algorithm]
+    start = time.perf_counter()
+    tables = pre_process(p)
+    pre = time.perf_counter() - start
+    start = time.perf_counter()
+    positions = search(t, p, *tables)
+    elapsed = time.perf_counter() - start
+    counted = CountingText(t[:counting_size])
+    search(counted, p, *tables)
+    return positions, pre, elapsed, counted.reads / float(max(len(counted), 1))
+
+def run_suite(corpora, lengths, names, patterns_per_length = 3, counting_size = 1 << 16, seed = 1):
+    rnd = random.Random(seed)
+    records = []
+    for corpus, t in corpora:
+        for m in lengths:
+            if m > len(t):
+                continue
+            patterns = pick_patterns(t, m, patterns_per_length, rnd)
+            for algorithm in names:
+                pre = elapsed = reads = 0.0
+                correct = True
+                for p in patterns:
+                    positions, a, b, c = bench(t, p, algorithm, counting_size)
+                    pre, elapsed, reads = pre + a, elapsed + b, reads + c
+                    expected = [i for i in range(len(t) - m + 1) if t.startswith(p, i)]
+                    correct = correct and positions == expected
+                k = float(len(patterns))
+                records.append({
+                    'corpus': corpus,
+                    'n': len(t),
+                    'm': m,
+                    'algorithm': algorithm,
+                    'preprocess_us': 1e6 * pre / k,
+                    'search_s': elapsed / k,
+                    'mb_per_s': len(t) / 1e6 / max(elapsed / k, 1e-9),
+                    'reads_per_byte': reads / k,
+                    'correct': correct,
+                })
+    return records
+
+def print_table(records, out = sys.stdout):
+    out.write('%-10s %5s %-18s %14s %10s %10s %12s %8s\n' % ('corpus', 'm', 'algorithm', 'preprocess us', 'search s', 'MB/s', 'reads/byte', 'correct'))
+    for r in records:
+        out.write('%-10s %5d %-18s %14.1f %10.4f %10.2f %12.3f %8s\n' % (r['corpus'], r['m'], r['algorithm'],
+            r['preprocess_us'], r['search_s'], r['mb_per_s'], r['reads_per_byte'], r['correct']))
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description='Benchmark of the string matchers')
+    parser.add_argument('--size', type=int, default=1 << 18, help='characters of every generated corpus')
+    parser.add_argument('--corpora', default=','.join(corpus_kinds), help='generated corpora to use')
+    parser.add_argument('--corpus', action='append', default=[], metavar='NAME=PATH', help='load a corpus from a file')
+    parser.add_argument('--lengths', default='4,8,16,32,64,128', help='pattern lengths')
+    parser.add_argument('--algorithms', default=','.join(sorted(matchers)))
+    parser.add_argument('--patterns', type=int, default=3, help='patterns per length')
+    parser.add_argument('--counting-size', type=int, default=1 << 16, help='prefix of the text used to count reads')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='save the results to this file')
+    args = parser.parse_args(argv)
+
+    rnd = random.Random(args.seed)
+    corpora = [(kind, make_corpus(kind, args.size, rnd)) for kind in args.corpora.split(',') if kind]
+    for spec in args.corpus:
+        name, path = spec.split('=', 1)
+        corpora.append((name, load_corpus(path)))
+    lengths = [int(m) for m in args.lengths.split(',')]
+    names = args.algorithms.split(',')
+    for name in names:
+        if name not in matchers:
+            parser.error('unknown algorithm ' + name)
+
+    records = run_suite(corpora, lengths, names, args.patterns, args.counting_size, args.seed)
+    print_table(records)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'argv': sys.argv[1:] if argv == None else argv, 'results': records}, f, indent=1)
+    return records
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+'''
+    Bitap (Shift-And / Shift-Or) for exact and approximate matching
+    Paper: Ricardo Baeza-Yates and Gaston H. Gonnet. 1992. A new approach to text searching. Commun. ACM 35, 10 (October 1992), 74-82.
+    Paper: Sun Wu and Udi Manber. 1992. Fast text searching: allowing errors. Commun. ACM 35, 10 (October 1992), 83-91.
+    The KMP automaton of knuth_morris_prat.py only keeps the longest matched prefix, bitap keeps all of them:
+    bit j of R is set if p[0..j] is a suffix of the text read so far. Reading c:
+        R = ((R << 1) | 1) & B[c]        B[c] has bit j set if p[j] == c
+    and p ends at the current char if bit m-1 is set. (Shift-Or is the same with the bits complemented.)
+    The words are Python integers, so any m works and every step costs ceil(m/w) machine words.
+    With errors there is one R_d per number of errors d = 0..k, R_d is computed from R_{d-1}:
+        mismatches (Hamming): a char of p read as a different char of t
+        errors (Levenshtein): also a char of t inserted or a char of p deleted
+    so the scan is O(n * ceil(m/w) * k) instead of the O(n * m) of the dynamic programming.
+'''
+
+from results import collect
+
+
+# B[c], the chars that are not in the pattern have no entry (mask 0)
+def pre_process_bitap(p):
+    masks = {}
+    for j, c in enumerate(p):
+        masks[c] = masks.get(c, 0) | (1 << j)
+    return masks
+
+def iter_bitap(t, p, masks = None):
+    m = len(p)
+    if masks == None:
+        masks = pre_process_bitap(p)
+    found = 1 << (m - 1)
+    r = 0
+    for i, c in enumerate(t):
+        r = ((r << 1) | 1) & masks.get(c, 0)
+        if r & found:
+            yield i - m + 1
+
+def search_bitap(t, p, masks = None, first_k = None, out = None):
+    return collect(iter_bitap(t, p, masks), first_k, out)
+
+def count_bitap(t, p, masks = None):
+    return sum(1 for _ in iter_bitap(t, p, masks))
+
+
+'''
+    At most k mismatches. R_d: prefixes of p that end here with at most d mismatches,
+        R_d = (((R_d << 1) | 1) & B[c]) | ((R_{d-1} << 1) | 1)
+    the second term spends one mismatch on c (R_{d-1} is the value before reading c).
+    Yields (position, mismatches) for every window t[position:position+m] with at most k
+    mismatches, mismatches is the smallest d whose R_d has bit m-1.
+'''
+def iter_bitap_hamming(t, p, k, masks = None):
+    m = len(p)
+    if masks == None:
+        masks = pre_process_bitap(p)
+    found = 1 << (m - 1)
+    r = [0] * (k + 1)
+    for i, c in enumerate(t):
+        b = masks.get(c, 0)
+        prev = r[0]
+        r[0] = ((prev << 1) | 1) & b
+        for d in range(1, k + 1):
+            old = r[d]
+            r[d] = (((old << 1) | 1) & b) | ((prev << 1) | 1)
+            prev = old
+        if i >= m - 1 and r[k] & found:
+            d = 0
+            while not r[d] & found:
+                d = d + 1
+            yield i - m + 1, d
+
+def search_bitap_hamming(t, p, k, masks = None, first_k = None, out = None):
+    return collect(iter_bitap_hamming(t, p, k, masks), first_k, out)
+
+def count_bitap_hamming(t, p, k, masks = None):
+    return sum(1 for _ in iter_bitap_hamming(t, p, k, masks))
+
+
+'''
+    At most k errors (Wu-Manber). R_d starts with its d lowest bits set (the first d chars of p deleted)
+        R_d = (((R_d << 1) | 1) & B[c])        c matches p[j]
+            | ((R_{d-1} << 1) | 1)             c substituted for p[j]
+            | R_{d-1}                          c inserted
+            | ((R'_{d-1} << 1) | 1)            p[j] deleted (R' is the new value of R_{d-1})
+    An approximate match has no single start, so the yielded pairs are (end, errors) where end is
+    the position of the last char of the match and errors the smallest edit distance between p and a
+    substring of t ending there.
+'''
+def iter_bitap_edits(t, p, k, masks = None):
+    m = len(p)
+    k = min(k, m) # deleting all of p costs m, with k >= m every end position matches
+    if m == 0:
+        for i in range(len(t)):
+            yield i, 0
+        return
+    if masks == None:
+        masks = pre_process_bitap(p)
+    found = 1 << (m - 1)
+    r = [(1 << d) - 1 for d in range(k + 1)]
+    for i, c in enumerate(t):
+        b = masks.get(c, 0)
+        prev = r[0]
+        r[0] = ((prev << 1) | 1) & b
+        for d in range(1, k + 1):
+            old = r[d]
+            r[d] = (((old << 1) | 1) & b) | ((prev | r[d-1]) << 1) | prev | 1
+            prev = old
+        if r[k] & found:
+            d = 0
+            while not r[d] & found:
+                d = d + 1
+            yield i, d
+
+def search_bitap_edits(t, p, k, masks = None, first_k = None, out = None):
+    return collect(iter_bitap_edits(t, p, k, masks), first_k, out)
+
+def count_bitap_edits(t, p, k, masks = None):
+    return sum(1 for _ in iter_bitap_edits(t, p, k, masks))
+
+
+# The O(n * m) references: every window for the mismatches, Sellers' dynamic programming for the errors
+def naive_hamming(t, p, k):
+    m = len(p)
+    x = []
+    for pos in range(len(t) - m + 1):
+        d = sum(1 for j in range(m) if t[pos+j] != p[j])
+        if d <= k:
+            x.append((pos, d))
+    return x
+
+def naive_edits(t, p, k):
+    m = len(p)
+    col = list(range(m + 1)) # col[j] = distance between p[0:j] and the best suffix of the text read
+    x = []
+    for i, c in enumerate(t):
+        diag = col[0]
+        for j in range(1, m + 1):
+            up = col[j]
+            col[j] = min(up + 1, col[j-1] + 1, diag + (p[j-1] != c))
+            diag = up
+        if col[m] <= k:
+            x.append((i, col[m]))
+    return x
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    t = 'AIABBABABRQMYOAABBBBABABYOSGBBGTVBHABBABABSUJKSKKHKJABBABBABABABAYRQMYOIUHKJHJHSDASDASDNIAURTO ABBABABNLK'
+    for pos in search_bitap(t, 'ABBABAB'):
+        print('Pattern found at position = ' + str(pos))
+    for pos, d in search_bitap_hamming(t, 'ABBXBAB', 1):
+        print('Pattern found at position = ' + str(pos) + ' with ' + str(d) + ' mismatches')
+    for end, d in search_bitap_edits(t, 'ABBABBAB', 1):
+        print('Pattern ends at position = ' + str(end) + ' with ' + str(d) + ' errors')
+
+    # fuzzy log signatures: log lines with a few typos, against the dynamic programming
+    rnd = random.Random(1)
+    words = ['error', 'timeout', 'connection', 'refused', 'user', 'login', 'failed', 'GET', '/api/v1/items', '200', '503']
+    t = ' '.join(rnd.choice(words) for _ in range(20000))
+    for m, k in ((16, 2), (48, 3), (120, 4)):
+        pos = rnd.randint(0, len(t) - m)
+        p = list(t[pos:pos+m])
+        for _ in range(k):
+            p[rnd.randrange(m)] = rnd.choice('abcdefghijklmnopqrstuvwxyz')
+        p = ''.join(p)
+        hamming = search_bitap_hamming(t, p, k)
+        assert hamming == naive_hamming(t, p, k)
+        start = time.perf_counter()
+        edits = search_bitap_edits(t, p, k)
+        end = time.perf_counter()
+        assert edits == naive_edits(t, p, k)
+        naive_end = time.perf_counter()
+        print('n = %d m = %d k = %d: %d windows, %d end positions, bitap = %.3f s, dynamic programming = %.3f s' % (len(t), m, k,
+            len(hamming), len(edits), end - start, naive_end - end))
+
+    # k >= m: every end position is within m edits (delete all of p)
+    for k in (4, 6):
+        edits = search_bitap_edits(t[:2000], 'rror', k)
+        assert edits == naive_edits(t[:2000], 'rror', k) and len(edits) == 2000
@@ -3,13 +3,15 @@
     Paper: R.S. Boyer, J.S. Moore: A Fast String Searching Algorithm. Communications of the ACM, 20, 10, 762-772 (1977)
 '''
 
+from array import array
+
+from results import collect
+
 
 '''
     Rightmost occurrence of character
     Known as Bad character Heuristic
 '''
-import pdb
-
 def pre_process_delta_1(p):
     alphabet_lenght = 1024
     x = [-1]*alphabet_lenght
@@ -48,10 +50,11 @@ def pre_process_delta_2(p):
             k = pattern[k]
     return shift
 
-def search_boyer_moore(t,p):
-    x = []
-    delta_1 = pre_process_delta_1(p)
-    delta_2 = pre_process_delta_2(p)
+def iter_boyer_moore(t,p, delta_1 = None, delta_2 = None):
+    if delta_1 == None:
+        delta_1 = pre_process_delta_1(p)
+    if delta_2 == None:
+        delta_2 = pre_process_delta_2(p)
 
     m = len(p)
     n = len(t)
@@ -68,18 +71,166 @@ def search_boyer_moore(t,p):
         else:
             if k == 0:
                 k = m - 1
-                x.append(i)
+                yield i
                 i = i + m
             else :
                 k = k - 1
                 i = i - 1
+
+def search_boyer_moore(t,p, delta_1 = None, delta_2 = None, first_k = None, out = None):
+    return collect(iter_boyer_moore(t, p, delta_1, delta_2), first_k, out)
+
+def count_boyer_moore(t,p, delta_1 = None, delta_2 = None):
+    return sum(1 for _ in iter_boyer_moore(t, p, delta_1, delta_2))
+
+
+'''
+    Turbo-BM: Boyer-Moore that remembers the factor of the text matched in the previous window
+    Paper: M. Crochemore, A. Czumaj, L. Gasieniec, S. Jarominek, T. Lecroq, W. Plandowski, W. Rytter. 1994. Speeding up two string-matching algorithms. Algorithmica 12, 247-267.
+    After a good suffix shift, the memory u is the length of the suffix of p that matched in the
+    previous window and is now aligned under the text again. When the scan reaches it, it is
+    jumped over instead of compared once more. If the suffix matched now (v) is shorter than u, the
+    two factors of the text cannot both be periods of the window and the turbo shift u - v
+    is valid. The same tables are used (delta_2[k+1] is the good suffix shift of a mismatch
+    at k, delta_2[0] the period of p), but at most 2n characters are compared
+    where the plain version needs O(nm) on periodic inputs like p = AAA and t = AAAA...A.
+'''
+def iter_turbo_boyer_moore(t, p, delta_1 = None, delta_2 = None):
+    if delta_1 == None:
+        delta_1 = pre_process_delta_1(p)
+    if delta_2 == None:
+        delta_2 = pre_process_delta_2(p)
+    return turbo_boyer_moore_scan(t, p, delta_1, delta_2, ord, 0, len(t))
+
+# the scan of both modes, code maps a char of t to its slot in delta_1 (None: t[i] is the slot)
+def turbo_boyer_moore_scan(t, p, delta_1, delta_2, code, start, end):
+    m = len(p)
+    pos = start
+    u = 0 # memory, length of the factor matched in the previous window
+    shift = m
+    while pos <= end - m:
+        k = m - 1
+        while k >= 0 and p[k] == t[pos + k]:
+            k = k - 1
+            if u != 0 and k == m - 1 - shift:
+                k = k - u # jump over the memorized factor
+        if k < 0:
+            yield pos
+            shift = delta_2[0]
+            u = m - shift
+        else:
+            v = m - 1 - k
+            turbo_shift = u - v
+            c = t[pos + k]
+            bc_shift = k - delta_1[c if code == None else code(c)]
+            shift = max(turbo_shift, bc_shift, delta_2[k+1])
+            if shift == delta_2[k+1]:
+                u = min(m - shift, v)
+            else:
+                if turbo_shift < bc_shift:
+                    shift = max(shift, u + 1)
+                u = 0
+        pos = pos + shift
+
+def search_turbo_boyer_moore(t, p, delta_1 = None, delta_2 = None, first_k = None, out = None):
+    return collect(iter_turbo_boyer_moore(t, p, delta_1, delta_2), first_k, out)
+
+def count_turbo_boyer_moore(t, p, delta_1 = None, delta_2 = None):
+    return sum(1 for _ in iter_turbo_boyer_moore(t, p, delta_1, delta_2))
+
+
+# Bytes mode (mmap_search.py): delta_1 is an array of 256 slots, delta_2 is unchanged, windows in t[start:end]
+def pre_process_delta_1_bytes(p):
+    x = array('l', [-1]) * 256
+    m = len(p)
+    for i in range(m):
+        x[p[i]] = i
     return x
 
+def iter_boyer_moore_bytes(t, p, delta_1 = None, delta_2 = None, start = 0, end = None):
+    if delta_1 == None:
+        delta_1 = pre_process_delta_1_bytes(p)
+    if delta_2 == None:
+        delta_2 = pre_process_delta_2(p)
+    if end == None:
+        end = len(t)
+    m = len(p)
+    i = start + m - 1
+    k = m - 1
+    while i < end:
+        if t[i] != p[k]:
+            shift1 = m - 1 - delta_1[t[i]]
+            shift2 = m - k
+            shift3 = delta_2[k+1]
+            i = i + max(shift3, shift1, shift2)
+            k = m - 1
+        else:
+            if k == 0:
+                k = m - 1
+                yield i
+                i = i + m
+            else :
+                k = k - 1
+                i = i - 1
+
+def search_boyer_moore_bytes(t, p, delta_1 = None, delta_2 = None, start = 0, end = None, first_k = None, out = None):
+    return collect(iter_boyer_moore_bytes(t, p, delta_1, delta_2, start, end), first_k, out)
+
+def count_boyer_moore_bytes(t, p, delta_1 = None, delta_2 = None, start = 0, end = None):
+    return sum(1 for _ in iter_boyer_moore_bytes(t, p, delta_1, delta_2, start, end))
+
+
+def iter_turbo_boyer_moore_bytes(t, p, delta_1 = None, delta_2 = None, start = 0, end = None):
+    if delta_1 == None:
+        delta_1 = pre_process_delta_1_bytes(p)
+    if delta_2 == None:
+        delta_2 = pre_process_delta_2(p)
+    if end == None:
+        end = len(t)
+    return turbo_boyer_moore_scan(t, p, delta_1, delta_2, None, start, end)
+
+def search_turbo_boyer_moore_bytes(t, p, delta_1 = None, delta_2 = None, start = 0, end = None, first_k = None, out = None):
+    return collect(iter_turbo_boyer_moore_bytes(t, p, delta_1, delta_2, start, end), first_k, out)
+
+def count_turbo_boyer_moore_bytes(t, p, delta_1 = None, delta_2 = None, start = 0, end = None):
+    return sum(1 for _ in iter_turbo_boyer_moore_bytes(t, p, delta_1, delta_2, start, end))
+
+
 if __name__ == "__main__":
 
     t = 'AIABBABABRQMYOAABBBBABABYOSGBBGTVBHABBABABSUJKSKKHKJABBABBABABABAYRQMYOIUHKJHJHSDASDASDNNLK'
     p = 'ABBABAB'
     positions = search_boyer_moore(t,p)
     for p in positions:
-        print 'Pattern found at position = ' + str(p)
+        print('Pattern found at position = ' + str(p))
+
+    for pos in search_turbo_boyer_moore(t, 'ABBABAB'):
+        print('Pattern found at position = ' + str(pos) + ' (turbo)')
+
+    # periodic and adversarial inputs: characters of the text read per text character
+    import random
+    import time
+    from benchmark import CountingText
 
+    rnd = random.Random(1)
+    n = 1 << 16
+    cases = [
+        ('A^n, p = A^m', 'A' * n, 'A' * 64),
+        ('A^n, p = BA^(m-1)', 'A' * n, 'B' + 'A' * 63),
+        ('(AB)^n, p = (AB)^(m/2)', 'AB' * (n // 2), 'AB' * 32),
+        ('(A^7B)^n, p = A^7BA^7', 'AAAAAAAB' * (n // 8), 'AAAAAAABAAAAAAA'),
+        ('dna', ''.join(rnd.choice('ACGT') for _ in range(n)), None),
+    ]
+    for name, t, p in cases:
+        if p == None:
+            p = t[n//2:n//2+32]
+        line = '%-26s m = %3d' % (name, len(p))
+        results = []
+        for label, search in (('boyer_moore', search_boyer_moore), ('turbo', search_turbo_boyer_moore)):
+            counted = CountingText(t)
+            start = time.perf_counter()
+            results.append(search(counted, p))
+            elapsed = time.perf_counter() - start
+            line = line + '  %s: %6.3f reads/char %.3f s' % (label, counted.reads / float(n), elapsed)
+        assert results[0] == results[1]
+        print(line)
@@ -0,0 +1,191 @@
+'''
+    Content defined chunking (CDC) with the BuzHash of karp_rabin.py
+    Paper: Athicha Muthitacharoen, Benjie Chen, and David Mazieres. 2001. A low-bandwidth network file system. SOSP '01.
+    A chunk ends where the rolling hash of the last `window` bytes has its low bits equal to zero,
+    so the boundaries depend on the content and not on the offsets: inserting a byte at the
+    beginning of a file only changes the chunks around it, the rest keep their digests and are
+    deduplicated. With mask = avg_size - 1 a boundary appears every avg_size bytes on average,
+    min_size and max_size bound the length of the chunks.
+    The first min_size - window bytes of a chunk can never be a boundary, they are not hashed.
+    Once the window is full the hash only depends on the last `window` bytes:
+        h(i) = xor_{j < window} rotate(table[t[i-j]], j)
+    so with NumPy the hash of every position of a block is computed with a few array
+    operations and only the min/max rules are applied one boundary at a time. Without
+    NumPy the rolling loop is used, both give the same chunks.
+'''
+
+import hashlib
+from collections import namedtuple
+
+from karp_rabin import buzhash_table, buzhash_mask, left_rotate
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def rotate(x, n):
+    n = n % 64
+    if n == 0:
+        return x
+    return (x << np.uint64(n)) | (x >> np.uint64(64 - n))
+
+
+Chunk = namedtuple('Chunk', ['offset', 'length', 'digest'])
+
+
+class Chunker():
+
+    def __init__(self, min_size = 2048, avg_size = 8192, max_size = 65536, window = 48, digest = 'sha256'):
+        assert avg_size & (avg_size - 1) == 0, 'avg_size must be a power of 2'
+        assert window <= min_size <= avg_size <= max_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.window = window
+        self.mask = avg_size - 1
+        self.digest = digest
+        # word of the byte leaving the window, already rotated by the window length
+        self.out_table = [left_rotate(w, window) for w in buzhash_table]
+
+    # blocks is an iterable of bytes like objects, yields the Chunks
+    def chunks(self, blocks):
+        if np != None:
+            return self.chunks_numpy(blocks)
+        return self.chunks_rolling(blocks)
+
+    def chunks_rolling(self, blocks):
+        w = self.window
+        min_size = self.min_size
+        max_size = self.max_size
+        mask = self.mask
+        table = buzhash_table
+        out_table = self.out_table
+        full = buzhash_mask
+        high = 63
+
+        tail = b'' # last w bytes of the previous block, the bytes that may leave the window
+        base = 0 # absolute offset of data[0]
+        chunk_start = 0
+        h = 0
+        digest = hashlib.new(self.digest)
+        for block in blocks:
+            if not block:
+                continue
+            data = memoryview(tail + bytes(block))
+            n = len(data)
+            i = len(tail)
+            seg = i # first byte of data not yet added to digest
+            while i < n:
+                rel = base + i - chunk_start # position of data[i] inside the chunk
+                if rel < min_size - w: # skip the bytes that can not be a boundary
+                    i = i + min(min_size - w - rel, n - i)
+                    continue
+                h = (((h << 1) | (h >> high)) & full) ^ table[data[i]]
+                if rel >= min_size:
+                    h = h ^ out_table[data[i - w]]
+                if rel >= min_size - 1 and ((h & mask) == 0 or rel + 1 >= max_size):
+                    digest.update(data[seg:i+1])
+                    yield Chunk(chunk_start, rel + 1, digest.hexdigest())
+                    digest = hashlib.new(self.digest)
+                    chunk_start = base + i + 1
+                    seg = i + 1
+                    h = 0
+                i = i + 1
+            digest.update(data[seg:])
+            tail = bytes(data[max(n - w, 0):])
+            base = base + n - len(tail)
+        end = base + len(tail)
+        if end > chunk_start:
+            yield Chunk(chunk_start, end - chunk_start, digest.hexdigest())
+
+    # absolute positions (ends of window) where the hash of the window has the low bits at zero.
+    # Windows are doubled instead of adding one byte at a time, so it takes O(log window) array
+    # operations: the hash of a window of length a + b ending at i is
+    #     rotate(h_a(i - b), b) ^ h_b(i)
+    # g[j] (and acc[j]) is the hash of the window that starts at j.
+    def candidates(self, data, base):
+        w = self.window
+        g = np.array(buzhash_table, dtype=np.uint64)[np.frombuffer(data, dtype=np.uint8)]
+        k = 1
+        acc = None
+        a = 0
+        rem = w
+        while True:
+            if rem & 1:
+                if acc is None:
+                    acc, a = g, k
+                else: # g goes before acc
+                    n = len(acc) - k
+                    acc, a = rotate(g[:n], a) ^ acc[k:k+n], a + k
+            rem = rem >> 1
+            if rem == 0:
+                break
+            n = len(g) - k
+            g, k = rotate(g[:n], k) ^ g[k:k+n], 2 * k
+        return np.flatnonzero((acc & np.uint64(self.mask)) == 0) + (base + w - 1)
+
+    def chunks_numpy(self, blocks):
+        w = self.window
+        min_size = self.min_size
+        max_size = self.max_size
+
+        tail = b''
+        base = 0 # absolute offset of data[0]
+        chunk_start = 0
+        digest = hashlib.new(self.digest)
+        for block in blocks:
+            if not block:
+                continue
+            data = memoryview(tail + bytes(block))
+            n = len(data)
+            end = base + n
+            cand = self.candidates(data, base) if n >= w else np.zeros(0, dtype=np.intp)
+            seg = len(tail)
+            while True:
+                first = chunk_start + min_size - 1 # first position that can end the chunk
+                k = np.searchsorted(cand, first)
+                cut = int(cand[k]) if k < len(cand) else end
+                cut = min(cut, chunk_start + max_size - 1)
+                if cut >= end:
+                    break
+                digest.update(data[seg:cut + 1 - base])
+                yield Chunk(chunk_start, cut + 1 - chunk_start, digest.hexdigest())
+                digest = hashlib.new(self.digest)
+                chunk_start = cut + 1
+                seg = cut + 1 - base
+            digest.update(data[seg:])
+            tail = bytes(data[max(n - (w - 1), 0):])
+            base = end - len(tail)
+        end = base + len(tail)
+        if end > chunk_start:
+            yield Chunk(chunk_start, end - chunk_start, digest.hexdigest())
+
+    def chunk_file(self, path, block_size = 1 << 20):
+        with open(path, 'rb') as f:
+            for chunk in self.chunks(iter(lambda: f.read(block_size), b'')):
+                yield chunk
+
+    def chunk_bytes(self, data, block_size = 1 << 20):
+        mv = memoryview(data)
+        return self.chunks(mv[i:i+block_size] for i in range(0, len(mv), block_size))
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    rnd = random.Random(1)
+    data = bytes(rnd.getrandbits(8) for _ in range(1 << 22))
+    edited = data[:1000] + b'inserted bytes' + data[1000:] # a small edit at the beginning
+
+    chunker = Chunker()
+    start = time.perf_counter()
+    original = list(chunker.chunk_bytes(data))
+    elapsed = time.perf_counter() - start
+    changed = list(chunker.chunk_bytes(edited))
+
+    assert sum(c.length for c in original) == len(data)
+    assert all(b.offset == a.offset + a.length for a, b in zip(original, original[1:]))
+    shared = set(c.digest for c in original) & set(c.digest for c in changed)
+    print('chunks = %d avg size = %d MB/s = %.2f' % (len(original), len(data) // len(original), len(data) / 1e6 / elapsed))
+    print('after the edit %d of %d chunks are still deduplicated' % (len(shared), len(changed)))
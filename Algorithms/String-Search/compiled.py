@@ -0,0 +1,164 @@
+'''
+    Compiled patterns, the same idea as re.compile.
+    The preprocessing tables of a matcher (delta_1/delta_2, shift tables, prefix function,
+    critical factorization, KMP DFA) are built once and reused for every text searched with the pattern.
+    compile() keeps the last compiled patterns in a bounded LRU cache keyed by (pattern, algorithm),
+    a bytearray pattern is keyed and compiled as bytes.
+'''
+
+from collections import OrderedDict, namedtuple
+
+from boyer_moore import pre_process_delta_1, pre_process_delta_2, search_boyer_moore, iter_boyer_moore
+from boyer_moore import pre_process_delta_1_bytes, search_boyer_moore_bytes, iter_boyer_moore_bytes
+from boyer_moore import search_turbo_boyer_moore, iter_turbo_boyer_moore
+from boyer_moore import search_turbo_boyer_moore_bytes, iter_turbo_boyer_moore_bytes
+from horspool import pre_process_horspool, search_horspool, iter_horspool
+from horspool import pre_process_horspool_bytes, search_horspool_bytes, iter_horspool_bytes
+from sunday import pre_process_sunday, search_sunday, iter_sunday
+from sunday import pre_process_sunday_bytes, search_sunday_bytes, iter_sunday_bytes
+from knuth_morris_prat import kmp_prefix_func, search_kmp, iter_kmp
+from knuth_morris_prat import KmpDFA, search_kmp_dfa, iter_kmp_dfa
+from two_way_matching import critical_factorization, search_two_way, iter_two_way
+from results import collect
+
+
+# algorithm -> (pre_process, search) for str patterns and for bytes patterns.
+# pre_process returns the tuple of tables that search takes after (t, p)
+algorithms = {
+    'boyer_moore': (lambda p: (pre_process_delta_1(p), pre_process_delta_2(p)), search_boyer_moore),
+    'turbo_boyer_moore': (lambda p: (pre_process_delta_1(p), pre_process_delta_2(p)), search_turbo_boyer_moore),
+    'horspool': (lambda p: (pre_process_horspool(p),), search_horspool),
+    'sunday': (lambda p: (pre_process_sunday(p),), search_sunday),
+    'kmp': (lambda p: (kmp_prefix_func(p),), search_kmp),
+    'kmp_dfa': (lambda p: (KmpDFA(p),), search_kmp_dfa),
+    'two_way': (lambda p: (critical_factorization(p),), search_two_way),
+}
+
+algorithms_bytes = {
+    'boyer_moore': (lambda p: (pre_process_delta_1_bytes(p), pre_process_delta_2(p)), search_boyer_moore_bytes),
+    'turbo_boyer_moore': (lambda p: (pre_process_delta_1_bytes(p), pre_process_delta_2(p)), search_turbo_boyer_moore_bytes),
+    'horspool': (lambda p: (pre_process_horspool_bytes(p),), search_horspool_bytes),
+    'sunday': (lambda p: (pre_process_sunday_bytes(p),), search_sunday_bytes),
+    'kmp': algorithms['kmp'],
+    'kmp_dfa': algorithms['kmp_dfa'],
+    'two_way': algorithms['two_way'],
+}
+
+# search function -> its lazy generator
+iterators = {
+    search_boyer_moore: iter_boyer_moore,
+    search_boyer_moore_bytes: iter_boyer_moore_bytes,
+    search_turbo_boyer_moore: iter_turbo_boyer_moore,
+    search_turbo_boyer_moore_bytes: iter_turbo_boyer_moore_bytes,
+    search_horspool: iter_horspool,
+    search_horspool_bytes: iter_horspool_bytes,
+    search_sunday: iter_sunday,
+    search_sunday_bytes: iter_sunday_bytes,
+    search_kmp: iter_kmp,
+    search_kmp_dfa: iter_kmp_dfa,
+    search_two_way: iter_two_way,
+}
+
+
+class CompiledPattern():
+
+    # tables: already built ones (e.g. loaded from a pattern store), skips the preprocessing
+    def __init__(self, pattern, algorithm = 'boyer_moore', tables = None):
+        if isinstance(pattern, (bytes, bytearray)):
+            table = algorithms_bytes
+        else:
+            table = algorithms
+        if algorithm not in table:
+            raise ValueError('unknown algorithm ' + repr(algorithm) + ' for ' + type(pattern).__name__ + ' patterns')
+        pre_process, search = table[algorithm]
+        self.pattern = pattern
+        self.algorithm = algorithm
+        self.tables = tables if tables != None else pre_process(pattern)
+        self.search_func = search
+        self.iter_func = iterators[search]
+
+    def search(self, t, first_k = None, out = None):
+        return collect(self.finditer(t), first_k, out)
+
+    def finditer(self, t):
+        return self.iter_func(t, self.pattern, *self.tables)
+
+    def count(self, t):
+        return sum(1 for _ in self.finditer(t))
+
+    def __repr__(self):
+        return 'CompiledPattern(' + repr(self.pattern) + ', ' + repr(self.algorithm) + ')'
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+class LRUCache():
+
+    def __init__(self, maxsize = 512):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        entry = self.entries.get(key)
+        if entry != None:
+            self.hits = self.hits + 1
+            self.entries.move_to_end(key)
+            return entry
+        self.misses = self.misses + 1
+        entry = build()
+        self.entries[key] = entry
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last = False) # least recently used
+        return entry
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.entries))
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+cache = LRUCache()
+
+def compile(pattern, algorithm = 'boyer_moore'):
+    if isinstance(pattern, bytearray): # unhashable, and the cached copy must not change with it
+        pattern = bytes(pattern)
+    return cache.get((pattern, algorithm), lambda: CompiledPattern(pattern, algorithm))
+
+def cache_info():
+    return cache.info()
+
+def cache_clear():
+    cache.clear()
+
+def set_cache_size(maxsize):
+    cache.maxsize = maxsize
+    while len(cache.entries) > maxsize:
+        cache.entries.popitem(last = False)
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    rnd = random.Random(1)
+    alphabet = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    patterns = [''.join(rnd.choice(alphabet) for _ in range(rnd.randint(4, 16))) for _ in range(200)]
+    texts = [''.join(rnd.choice(alphabet) for _ in range(64)) for _ in range(5000)]
+    pairs = [(t, rnd.choice(patterns)) for t in texts]
+
+    for algorithm in sorted(algorithms):
+        start = time.perf_counter()
+        for t, p in pairs:
+            algorithms[algorithm][1](t, p)
+        plain = time.perf_counter() - start
+        start = time.perf_counter()
+        for t, p in pairs:
+            compile(p, algorithm).search(t)
+        compiled = time.perf_counter() - start
+        print('%-18s uncompiled = %.3f s compiled = %.3f s' % (algorithm, plain, compiled))
+    print(cache_info())
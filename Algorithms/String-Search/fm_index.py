@@ -0,0 +1,203 @@
+'''
+    FM-index: compressed full-text index on the Burrows-Wheeler transform
+    Paper: P. Ferragina and G. Manzini. 2000. Opportunistic data structures with applications. FOCS 2000.
+    bwt[i] is the char before the i-th smallest suffix of t$ ($ the smallest, unique terminator).
+    The rows of the suffixes that start with cP are obtained from the rows that start with P (LF mapping):
+        lo = C[c] + occ(c, lo)    hi = C[c] + occ(c, hi)
+    C[c] = number of chars of t$ smaller than c, occ(c, i) = number of c in bwt[0:i].
+    So count() reads the pattern backwards, O(m) steps, and never touches the text.
+    Memory/speed trade-off:
+        - occ is only stored every occ_rate rows (sigma counts per sample), the rest is counted
+          in bwt between the sample and i.
+        - sa is only stored for the rows whose text position is a multiple of sa_rate, locate()
+          walks with LF from a row until a sampled one, at most sa_rate - 1 steps per occurrence.
+    The index is saved in one file and loaded with mmap, nothing is rebuilt at startup.
+'''
+
+import json
+import struct
+
+import numpy as np
+
+from results import collect_array
+from suffix_array import build_suffix_array, index_dtype, take_into
+
+magic = b'FMIX'
+version = 1
+
+
+class FMIndex():
+
+    def __init__(self, arrays, meta):
+        self.bwt = arrays['bwt']           # codes of the chars, uint8
+        self.occ = arrays['occ']           # occ[k, c] = number of c in bwt[0:k*occ_rate]
+        self.C = arrays['C'].tolist()
+        self.sampled_rows = arrays['sampled_rows']
+        self.sampled_pos = arrays['sampled_pos']
+        self.code = arrays['code'].tolist()   # byte -> code, -1 if not in the text
+        self.n = meta['n']
+        self.dollar = meta['dollar']        # row of $ in bwt, its bwt slot holds code 0
+        self.occ_rate = meta['occ_rate']
+        self.sa_rate = meta['sa_rate']
+
+    @classmethod
+    def build(cls, t, occ_rate = 64, sa_rate = 32):
+        s = np.frombuffer(t, dtype=np.uint8)
+        n = len(s)
+        dtype = index_dtype(n + 1)
+        symbols = np.unique(s)
+        code = np.full(256, -1, dtype=np.int16)
+        code[symbols] = np.arange(len(symbols), dtype=np.int16)
+        sigma = max(len(symbols), 1)
+        codes = code[s].astype(np.uint8)
+
+        sa = np.empty(n + 1, dtype=dtype) # suffix array of t$
+        sa[0] = n
+        sa[1:] = build_suffix_array(t)
+        before = sa - 1 # in place of sa's dtype, -1 for the row of the whole text
+        dollar = int(np.argmin(before))
+        np.maximum(before, 0, out=before)
+        bwt = np.zeros(n + 1, dtype=np.uint8)
+        if n > 0:
+            take_into(codes, before, bwt)
+        bwt[dollar] = 0
+        del before
+
+        rows = n + 1
+        samples = rows // occ_rate + 1
+        occ = np.zeros((samples, sigma), dtype=np.uint32 if rows < (1 << 32) else np.uint64)
+        for c in range(sigma):
+            is_c = bwt == c
+            is_c[dollar] = False
+            cum = np.cumsum(is_c, dtype=occ.dtype)
+            occ[1:, c] = cum[np.arange(1, samples) * occ_rate - 1]
+        counts = np.bincount(codes, minlength=sigma)
+        C = np.concatenate(([1], 1 + np.cumsum(counts)[:-1])).astype(np.int64)
+
+        sampled_rows = np.flatnonzero(sa % sa_rate == 0).astype(dtype)
+        sampled_pos = sa[sampled_rows]
+
+        arrays = {'bwt': bwt, 'occ': occ, 'C': C, 'sampled_rows': sampled_rows,
+                  'sampled_pos': sampled_pos, 'code': code}
+        meta = {'n': n, 'dollar': dollar, 'occ_rate': occ_rate, 'sa_rate': sa_rate}
+        return cls(arrays, meta)
+
+    def rank(self, c, i): # occ(c, i)
+        k = i // self.occ_rate
+        start = k * self.occ_rate
+        r = int(self.occ[k, c]) + int(np.count_nonzero(self.bwt[start:i] == c))
+        if c == 0 and start <= self.dollar < i:
+            r = r - 1
+        return r
+
+    def range(self, p):
+        lo = 0
+        hi = self.n + 1
+        for b in reversed(p):
+            c = self.code[b]
+            if c < 0:
+                return 0, 0
+            lo = self.C[c] + self.rank(c, lo)
+            hi = self.C[c] + self.rank(c, hi)
+            if lo >= hi:
+                return 0, 0
+        return lo, hi
+
+    def count(self, p):
+        lo, hi = self.range(p)
+        return hi - lo
+
+    def position(self, row):
+        steps = 0
+        sampled_rows = self.sampled_rows
+        while True:
+            k = np.searchsorted(sampled_rows, row)
+            if k < len(sampled_rows) and sampled_rows[k] == row:
+                return int(self.sampled_pos[k]) + steps
+            c = int(self.bwt[row]) # row is never the $ row, its text position 0 is sampled
+            row = self.C[c] + self.rank(c, row)
+            steps = steps + 1
+
+    # positions in text order, first_k stops after k occurrences (in suffix order, not the leftmost ones)
+    def locate(self, p, first_k = None, out = None):
+        lo, hi = self.range(p)
+        if first_k != None:
+            hi = min(hi, lo + first_k)
+        found = np.fromiter((self.position(row) for row in range(lo, hi)), dtype=np.int64, count=hi-lo)
+        return collect_array(np.sort(found), None, out)
+
+    '''
+        File: magic, version, length of the JSON header, JSON header, arrays.
+        Every array starts at a 64 byte aligned offset, the header gives dtype, shape and offset.
+    '''
+    def save(self, path):
+        arrays = {'bwt': self.bwt, 'occ': self.occ, 'C': np.array(self.C, dtype=np.int64),
+                  'sampled_rows': self.sampled_rows, 'sampled_pos': self.sampled_pos,
+                  'code': np.array(self.code, dtype=np.int16)}
+        meta = {'n': self.n, 'dollar': self.dollar, 'occ_rate': self.occ_rate, 'sa_rate': self.sa_rate}
+        layout = {}
+        offset = 0
+        for name, a in arrays.items():
+            layout[name] = {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': offset}
+            offset = align(offset + a.nbytes)
+        header = json.dumps({'meta': meta, 'arrays': layout}).encode()
+        start = align(len(magic) + 8 + len(header))
+        with open(path, 'wb') as f:
+            f.write(magic + struct.pack('<II', version, len(header)) + header)
+            for name, a in arrays.items():
+                f.seek(start + layout[name]['offset'])
+                f.write(np.ascontiguousarray(a).tobytes())
+
+    @classmethod
+    def load(cls, path):
+        mm = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(mm[:4]) != magic:
+            raise ValueError(path + ' is not an FM-index file')
+        file_version, header_len = struct.unpack('<II', bytes(mm[4:12]))
+        if file_version != version:
+            raise ValueError('unsupported FM-index version ' + str(file_version))
+        header = json.loads(bytes(mm[12:12+header_len]).decode())
+        start = align(12 + header_len)
+        arrays = {}
+        for name, d in header['arrays'].items():
+            dtype = np.dtype(d['dtype'])
+            count = int(np.prod(d['shape']))
+            a = np.frombuffer(mm, dtype=dtype, count=count, offset=start + d['offset'])
+            arrays[name] = a.reshape(d['shape'])
+        return cls(arrays, header['meta'])
+
+
+def align(offset):
+    return (offset + 63) & ~63
+
+
+if __name__ == "__main__":
+    import os
+    import random
+    import tempfile
+    import time
+
+    t = b'AIABBABABRQMYOAABBBBABABYOSGBBGTVBHABBABABSUJKSKKHKJABBABBABABABAYRQMYOIUHKJHJHSDASDASDNIAURTO ABBABABNLK'
+    index = FMIndex.build(t)
+    for pos in index.locate(b'ABBABAB'):
+        print('Pattern found at position = ' + str(pos))
+
+    rnd = random.Random(1)
+    n = 1 << 20
+    t = bytes(rnd.choice(b'ACGT') for _ in range(n))
+    path = os.path.join(tempfile.mkdtemp(), 'dna.fm')
+    start = time.perf_counter()
+    FMIndex.build(t).save(path)
+    built = time.perf_counter()
+    index = FMIndex.load(path)
+    loaded = time.perf_counter()
+    print('n = %d build = %.2f s load = %.4f s file = %.2f bytes per char' % (n, built - start, loaded - built, os.path.getsize(path) / float(n)))
+    patterns = [t[pos:pos+12] for pos in (rnd.randint(0, n - 12) for _ in range(200))]
+    start = time.perf_counter()
+    counts = [index.count(p) for p in patterns]
+    counted = time.perf_counter()
+    located = [index.locate(p) for p in patterns]
+    end = time.perf_counter()
+    assert counts == [len(x) for x in located]
+    print('200 count = %.4f s 200 locate = %.4f s (%d occurrences)' % (counted - start, end - counted, sum(counts)))
+    os.remove(path)
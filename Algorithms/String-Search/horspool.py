@@ -3,6 +3,10 @@
     Paper: R.N. Horspool: Practical Fast Searching in Strings. Software - Practice and Experience 10, 501-506 (1980) 
 '''
 
+from array import array
+
+from results import collect
+
 def pre_process_horspool(p):
     alphabet_lenght = 1024
     m = len(p)
@@ -12,29 +16,174 @@ def pre_process_horspool(p):
         x[ord(p[i])] = m - 1 - i
     return x
 
-def search_horspool(t,p):
-    x = []
-    dic = pre_process_horspool(p)
+def iter_horspool(t,p, dic = None):
+    if dic == None:
+        dic = pre_process_horspool(p)
     n = len(t)
     m = len(p)
     i = 0
     k = m - 1
-    while i < n - m:
+    while i <= n - m:
         while k > -1 and p[k] == t[i+k]:
             k = k - 1
         if k == -1:
-            x.append(i)
+            yield i
         k = m - 1
         i = i + dic[ord(t[i+m-1])]
 
+def search_horspool(t,p, dic = None, first_k = None, out = None):
+    return collect(iter_horspool(t, p, dic), first_k, out)
+
+def count_horspool(t,p, dic = None):
+    return sum(1 for _ in iter_horspool(t, p, dic))
+
+
+# Bytes mode (mmap_search.py): the shift table is an array of 256 slots, windows in t[start:end]
+def pre_process_horspool_bytes(p):
+    m = len(p)
+    x = array('l', [m]) * 256
+    for i in range(m-1):
+        x[p[i]] = m - 1 - i
+    return x
+
+def iter_horspool_bytes(t, p, shift = None, start = 0, end = None):
+    if shift == None:
+        shift = pre_process_horspool_bytes(p)
+    if end == None:
+        end = len(t)
+    n = end
+    m = len(p)
+    i = start
+    last = p[m-1]
+    while i <= n - m:
+        c = t[i+m-1]
+        if c == last:
+            k = m - 2
+            while k > -1 and p[k] == t[i+k]:
+                k = k - 1
+            if k == -1:
+                yield i
+        i = i + shift[c]
+
+def search_horspool_bytes(t, p, shift = None, start = 0, end = None, first_k = None, out = None):
+    return collect(iter_horspool_bytes(t, p, shift, start, end), first_k, out)
+
+def count_horspool_bytes(t, p, shift = None, start = 0, end = None):
+    return sum(1 for _ in iter_horspool_bytes(t, p, shift, start, end))
+
+
+'''
+    q-gram shifts (Wu-Manber style): on a small alphabet (DNA, hex) every char is in the pattern,
+    so the single char shifts are tiny. The shift is read from the last q chars of the window instead,
+    a q-gram that is not in p moves the window by m - q + 1.
+    The q-grams are hashed into 2^(5q) slots (at most 2^16) of a compact array, the low 5 bits of the
+    chars are kept, enough to tell apart ACGT and 0-9a-f. A collision can only make a shift smaller.
+    Hashing costs q reads per window, it pays off when the shifts grow more than that: DNA, or
+    hex with long patterns. For short patterns over 16 symbols the single char table stays faster.
+'''
+def qgram_bits(q):
+    return min(5 * q, 16)
+
+def qgram_hash(gram, mask):
+    h = 0
+    for c in gram:
+        h = (h << 5) ^ c
+    return h & mask
+
+def qgram_table(default, size):
+    return array('H' if default < 65536 else 'l', [default]) * size
+
+def pre_process_horspool_qgram(p, q = 2):
+    m = len(p)
+    assert m >= q
+    size = 1 << qgram_bits(q)
+    x = qgram_table(m - q + 1, size)
+    for j in range(m - q):
+        x[qgram_hash(p[j:j+q], size - 1)] = m - q - j
     return x
 
+def iter_horspool_qgram(t, p, shift = None, q = 2, start = 0, end = None):
+    if shift == None:
+        shift = pre_process_horspool_qgram(p, q)
+    if end == None:
+        end = len(t)
+    n = end
+    m = len(p)
+    mask = (1 << qgram_bits(q)) - 1
+    last = qgram_hash(p[m-q:], mask) # only the windows that end with it are compared
+    i = start
+    while i <= n - m:
+        h = 0
+        for c in t[i+m-q:i+m]:
+            h = (h << 5) ^ c
+        h = h & mask
+        if h == last:
+            k = m - 1
+            while k > -1 and p[k] == t[i+k]:
+                k = k - 1
+            if k == -1:
+                yield i
+        i = i + shift[h]
+
+def search_horspool_qgram(t, p, shift = None, q = 2, start = 0, end = None, first_k = None, out = None):
+    return collect(iter_horspool_qgram(t, p, shift, q, start, end), first_k, out)
+
+def count_horspool_qgram(t, p, shift = None, q = 2, start = 0, end = None):
+    return sum(1 for _ in iter_horspool_qgram(t, p, shift, q, start, end))
+
+
+# average of the shifts read for the q-grams of the text (q = 1: a char table indexed by the char)
+def average_shift(t, shift, q):
+    mask = len(shift) - 1
+    total = 0
+    for j in range(len(t) - q + 1):
+        total = total + shift[qgram_hash(t[j:j+q], mask)]
+    return total / float(max(len(t) - q + 1, 1))
+
+def benchmark(n = 1 << 20, seed = 1):
+    import random
+    import time
+    from sunday import pre_process_sunday_bytes, pre_process_sunday_qgram, search_sunday_bytes, search_sunday_qgram
+
+    rnd = random.Random(seed)
+    for name, alphabet in (('dna', b'ACGT'), ('hex', b'0123456789abcdef')):
+        t = bytes(rnd.choice(alphabet) for _ in range(n))
+        for m in (8, 16, 32, 64):
+            p = t[n//3:n//3+m]
+            sample = t[:1 << 16]
+            runs = [
+                ('horspool', 1, pre_process_horspool_bytes(p), search_horspool_bytes),
+                ('sunday', 1, pre_process_sunday_bytes(p), search_sunday_bytes),
+            ]
+            for q in (2, 3):
+                runs.append(('horspool q=%d' % q, q, pre_process_horspool_qgram(p, q), search_horspool_qgram))
+                runs.append(('sunday q=%d' % q, q, pre_process_sunday_qgram(p, q), search_sunday_qgram))
+            expected = None
+            for label, q, table, search in runs:
+                start = time.perf_counter()
+                x = search(t, p, table) if q == 1 else search(t, p, table, q)
+                elapsed = time.perf_counter() - start
+                if expected == None:
+                    expected = x
+                assert x == expected
+                avg = average_shift(sample, table, q)
+                print('%-4s m = %2d %-14s average shift = %5.2f %6.2f MB/s' % (name, m, label, avg, n / 1e6 / elapsed))
+
+
 if __name__ == "__main__":
 
     t = 'AIABBABABRQMYOAABBBBABABYOSGBBGTVBHABBABABSUJKSKKHKJABBABBABABABAYRQMYOIUHKJHJHSDASDASDNIAURTO ABBABABNLK'
     p = 'ABBABAB'
     positions = search_horspool(t,p)
     for p in positions:
-        print 'Pattern found at position = ' + str(p)
+        print('Pattern found at position = ' + str(p))
+
+    positions = search_horspool_bytes(t.encode(), b'ABBABAB')
+    for p in positions:
+        print('Pattern found at position = ' + str(p) + ' (bytes)')
 
+    positions = search_horspool_qgram(t.encode(), b'ABBABAB')
+    for p in positions:
+        print('Pattern found at position = ' + str(p) + ' (bigrams)')
 
+    benchmark()
@@ -1,24 +1,44 @@
 '''
-    Naive Rabin-Karp implementation for searching matches in a string 
-    Two Rolling hash implementations 
+    Rabin-Karp for searching matches in a string, one pattern or a set of patterns of the same length
+    Two Rolling hash implementations, the search itself is done by RabinKarpSet
     https://en.wikipedia.org/wiki/Rolling_hash
 '''
 
+import random
+from itertools import islice
+
+from results import collect
+
+
+'''
+    BuzHash is a cyclic polynomial: every char is mapped to a random 64 bit word through a table,
+    the hash is rotated one bit per char and the char that leaves the window is removed by xoring
+    its word rotated by k. All the arithmetic is done on 64 bits, so the hash never grows.
+'''
+buzhash_bits = 64
+buzhash_mask = (1 << buzhash_bits) - 1
+
+def make_buzhash_table(seed = 0x62757a68):
+    rnd = random.Random(seed)
+    return [rnd.getrandbits(buzhash_bits) for _ in range(256)]
+
+buzhash_table = make_buzhash_table()
+
+def left_rotate(x, n):
+    n = n % buzhash_bits
+    return ((x << n) | (x >> (buzhash_bits - n))) & buzhash_mask
 
 
 class BuzHash():
     def __init__(self,s):
-        first_time = True
         self.hash = 0
         self.k = len(s)
-        i = 1
         x = 0
 
         for c in s:
             x = self.left_rotate(x,1)
             x = x ^ self.char_to_int(c)
         self.hash = x
-        print 'buzhash val = ' + str(self.hash) + ' for str = ' + s
 
 
     def slide(self, previtm, nextitm):
@@ -29,14 +49,16 @@ class BuzHash():
         self.hash =  x 
 
 
+    # c is a char of a str or the int of a bytes.
+    # Chars above 255 share the words of the table, it only adds collisions
     def char_to_int(self,c):
-        #Naive implementation. Change for better hashing results
-        return ord(c)
+        if not isinstance(c, int):
+            c = ord(c)
+        return buzhash_table[c & 0xff]
 
     #x is the number an n the positions t rotate, in our case, is one
     def left_rotate(self,x,n):
-        # Supposing 64 bit machine
-        return (x << n) | (x >> (64-n))
+        return left_rotate(x, n)
 
 
 class PolyRollingHash(): #Polynomial rolling hash
@@ -53,46 +75,114 @@ class PolyRollingHash(): #Polynomial rolling hash
             self.hash = self.hash * self.a   
             self.hash = self.hash + ord(c)
         self.hash = self.hash  % self.n
+        self.a_k = pow(self.a, self.k-1, self.n) # a^(k-1) mod n, computed once
 
 
     def slide(self, previtm,nextitm):
-        minus_val = ord(previtm) * (self.a ** (self.k-1)) 
+        minus_val = ord(previtm) * self.a_k
         self.hash = ( (self.hash - minus_val ) * self.a) + ord(nextitm) 
         self.hash = self.hash % self.n
         return self.hash
         
 
-def search_rabin_karp(t,p):
-#    rh_p = PolyRollingHash(p)
-    rh_p = BuzHash(p)
-    rh_t = None
-
-    n = len(p) 
-    x = []
-    t1 = ''
-    pos = 0
-    t_idx = 0
-    nextitm = 'a'
-    previtm = 'a'
-    while pos + n < len(t):
-        while len(t1) < n:
-            t1 = t1 + t[t_idx]
-            t_idx = t_idx + 1
-        nextitm = t1[n-1]
-        if rh_t == None:
-#           rh_t = PolyRollingHash(t1)
-           rh_t = BuzHash(t1)
-        else:
-           rh_t.slide(previtm,nextitm)
-        
-        if rh_p.hash == rh_t.hash:
-            if p == t1:
-                x.append(pos)
+# One pattern is a set of one: the hash slides over a fixed window of the text, O(1) per position
+def iter_rabin_karp(t,p):
+    if len(p) == 0:
+        for pos in range(len(t) + 1):
+            yield pos
+        return
+    for _, pos in RabinKarpSet([p]).iter(t):
+        yield pos
+
+def search_rabin_karp(t,p, first_k = None, out = None):
+    return collect(iter_rabin_karp(t, p), first_k, out)
 
-        previtm = t1[0]
-        t1 = t1[1:]
-        pos = pos + 1
-    return x
+def count_rabin_karp(t,p):
+    return sum(1 for _ in iter_rabin_karp(t, p))
+
+
+'''
+    Karp-Rabin for a set of patterns of the same length m, e.g., thousands of fixed length signatures.
+    The window is never rebuilt: the hash slides with the precomputed a^(m-1) over a memoryview of
+    the text (no copy), O(1) per position. The hash of every pattern goes to a dict, so all the
+    patterns are checked with one lookup per position and the candidates are verified.
+    Modulo the Mersenne prime 2^61 - 1, so collisions are very rare.
+'''
+class RabinKarpSet():
+
+    def __init__(self, patterns, a = 1000003, mod = (1 << 61) - 1):
+        self.patterns = list(patterns)
+        assert len(self.patterns) > 0
+        self.m = len(self.patterns[0])
+        assert self.m > 0
+        self.a = a
+        self.mod = mod
+        self.a_m = pow(a, self.m - 1, mod)
+        self.table = {} # hash -> pattern ids
+        for pid, p in enumerate(self.patterns):
+            assert len(p) == self.m, 'all the patterns must have the same length'
+            self.table.setdefault(self.hash(self.codes(p)), []).append(pid)
+
+    # str, a bytes-like object, or any sequence of chars or ints (e.g. benchmark.CountingText)
+    def codes(self, s):
+        if isinstance(s, str):
+            return map(ord, s)
+        if self.is_buffer(s):
+            return iter(memoryview(s).cast('B'))
+        return (c if isinstance(c, int) else ord(c) for c in s)
+
+    def is_buffer(self, s):
+        try:
+            memoryview(s)
+        except TypeError:
+            return False
+        return True
+
+    def hash(self, codes):
+        h = 0
+        for c in codes:
+            h = (h * self.a + c) % self.mod
+        return h
+
+    # (pattern_id, position) pairs ordered by position
+    def iter(self, t):
+        m = self.m
+        n = len(t)
+        if n < m:
+            return
+        a = self.a
+        a_m = self.a_m
+        mod = self.mod
+        table = self.table
+        patterns = self.patterns
+        window = memoryview(t).cast('B') if self.is_buffer(t) else t
+        incoming = self.codes(t)
+        h = self.hash(islice(incoming, m))
+        pos = 0
+        for outgoing in self.codes(t):
+            ids = table.get(h)
+            if ids != None:
+                for pid in ids:
+                    if window[pos:pos+m] == patterns[pid]:
+                        yield pid, pos
+            nextitm = next(incoming, None)
+            if nextitm == None:
+                break
+            h = ((h - outgoing * a_m) * a + nextitm) % mod
+            pos = pos + 1
+
+    def search(self, t, first_k = None, out = None):
+        return collect(self.iter(t), first_k, out)
+
+
+def iter_rabin_karp_set(t, patterns):
+    return RabinKarpSet(patterns).iter(t)
+
+def search_rabin_karp_set(t, patterns, first_k = None, out = None):
+    return RabinKarpSet(patterns).search(t, first_k, out)
+
+def count_rabin_karp_set(t, patterns):
+    return sum(1 for _ in iter_rabin_karp_set(t, patterns))
 
 if __name__ == "__main__":
 
@@ -100,5 +190,9 @@ if __name__ == "__main__":
     p = 'RQM'
     positions = search_rabin_karp(t,p)
     for p in positions:
-        print 'Pattern found at position = ' + str(p)
+        print('Pattern found at position = ' + str(p))
+
+    signatures = ['RQM', 'SKK', 'HJH', 'ZZZ']
+    for pid, pos in search_rabin_karp_set(t.encode(), [s.encode() for s in signatures]):
+        print('Pattern ' + signatures[pid] + ' found at position = ' + str(pos))
 
@@ -0,0 +1,148 @@
+'''
+    Two-dimensional Karp-Rabin: find an r x c tile in an N x M array with NumPy
+    Paper: Richard M. Karp and Michael O. Rabin. 1987. Efficient randomized pattern-matching algorithms. IBM J. Res. Dev. 31, 2 (March 1987), 249-260.
+    The polynomial hash of PolyRollingHash (karp_rabin.py) is applied twice: every row window of
+    width c is hashed with base a, then every column window of r row hashes is hashed with base b.
+    The rolling update h' = (h - x_k a^(c-1)) a + x_{k+c} is sequential, so it is replaced by prefix
+    sums that NumPy computes for all the windows at once:
+        S[j] = sum_{k<j} x[k] a^-k (mod q)    hash(x[j:j+c]) = (S[j+c] - S[j]) a^j = sum_k x[j+k] a^-k
+    which is the hash of the window with base a^-1, the same for the tile. The work is O(N*M)
+    whatever the size of the tile. Every position whose hash equals the one of the tile is verified,
+    so a collision costs time but never a false match.
+    q = 2^31 - 1: a product of two residues fits in a uint64, and so does a cumulative sum of up to 2^33 of them.
+'''
+
+import numpy as np
+
+from results import collect
+
+mod = (1 << 31) - 1
+base_row = 1000003
+base_col = 999983
+
+
+def powers(base, count):
+    pw = np.empty(max(count, 1), dtype=np.uint64)
+    pw[0] = 1
+    k = 1
+    while k < count: # doubling: pw[k:2k] = pw[0:k] * base^k
+        step = min(k, count - k)
+        pw[k:k+step] = pw[:step] * np.uint64(pow(base, k, mod)) % np.uint64(mod)
+        k = k + step
+    return pw
+
+# the values as residues mod q, floats and other dtypes are compared by their bits
+def residues(x):
+    x = np.asarray(x)
+    kind = x.dtype.kind
+    if kind == 'c': # real * 2^(bits of a part) + imaginary, mod q
+        part = x.real.dtype.itemsize
+        return (residues(x.real) * np.uint64(pow(2, 8 * part, mod)) + residues(x.imag)) % np.uint64(mod)
+    if kind == 'O' or x.dtype.itemsize > 8:
+        raise TypeError('karp_rabin_2d cannot hash values of dtype ' + str(x.dtype))
+    if kind == 'f':
+        x = x + x.dtype.type(0) # -0.0 + 0.0 = 0.0, equal values get the same bits
+    if kind not in 'biu':
+        x = x.view(np.dtype('u' + str(x.dtype.itemsize)))
+    return x.astype(np.uint64) % np.uint64(mod) # a negative value wraps to 2^64 - v, still a fixed residue
+
+# p in the dtype of t, None if its values do not survive the cast (300 is 44 in a uint8)
+def cast_tile(t, p):
+    p = np.asarray(p)
+    tile = p.astype(t.dtype)
+    if not np.array_equal(tile, p):
+        return None
+    return tile
+
+# hash of every window of `width` along the last axis, with base^-1
+def window_hashes(x, width, base):
+    q = np.uint64(mod)
+    length = x.shape[-1]
+    inv = powers(pow(base, mod - 2, mod), length)
+    s = np.zeros(x.shape[:-1] + (length + 1,), dtype=np.uint64)
+    np.cumsum(x * inv % q, axis=-1, out=s[..., 1:])
+    s = s % q
+    diff = (s[..., width:] + q - s[..., :length-width+1]) % q
+    return diff * powers(base, length - width + 1) % q
+
+def hash_2d(x, r, c):
+    rows = window_hashes(x, c, base_row)              # N x (M-c+1)
+    return window_hashes(rows.T.copy(), r, base_col).T # (N-r+1) x (M-c+1)
+
+# (row, col) of the top left corner of every occurrence of p in t, by row then col
+def iter_karp_rabin_2d(t, p):
+    t = np.asarray(t)
+    tile = cast_tile(t, p)
+    assert t.ndim == 2 and np.ndim(p) == 2
+    if tile is None:
+        return
+    p = tile
+    r, c = p.shape
+    if r == 0 or c == 0 or r > t.shape[0] or c > t.shape[1]:
+        return
+    target = hash_2d(residues(p), r, c)[0, 0]
+    for i, j in np.argwhere(hash_2d(residues(t), r, c) == target).tolist():
+        if np.array_equal(t[i:i+r, j:j+c], p):
+            yield i, j
+
+def search_karp_rabin_2d(t, p, first_k = None, out = None):
+    return collect(iter_karp_rabin_2d(t, p), first_k, out)
+
+def count_karp_rabin_2d(t, p):
+    return sum(1 for _ in iter_karp_rabin_2d(t, p))
+
+
+# The references: every window compared with the tile, one cell of the tile at a time over all the
+# windows (O(N*M*r*c) vectorized), and the plain Python loop over the windows.
+def search_naive_2d(t, p):
+    t = np.asarray(t)
+    p = cast_tile(t, p)
+    if p is None or p.shape[0] > t.shape[0] or p.shape[1] > t.shape[1]:
+        return []
+    r, c = p.shape
+    n = t.shape[0] - r + 1
+    m = t.shape[1] - c + 1
+    ok = np.ones((n, m), dtype=bool)
+    for i in range(r):
+        for j in range(c):
+            ok &= t[i:i+n, j:j+m] == p[i, j]
+    return [tuple(pos) for pos in np.argwhere(ok).tolist()]
+
+def search_loop_2d(t, p):
+    r, c = p.shape
+    x = []
+    for i in range(t.shape[0] - r + 1):
+        for j in range(t.shape[1] - c + 1):
+            if np.array_equal(t[i:i+r, j:j+c], p):
+                x.append((i, j))
+    return x
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(1)
+    t = rng.integers(0, 4, size=(12, 16), dtype=np.uint8)
+    p = t[5:8, 9:13].copy()
+    for i, j in search_karp_rabin_2d(t, p):
+        print('Tile found at row = ' + str(i) + ' col = ' + str(j))
+
+    # sensor frames (uint16) and byte matrices with planted tiles
+    for name, dtype, high, size, tile in (('bytes', np.uint8, 4, 1000, (8, 8)), ('bytes', np.uint8, 4, 2000, (32, 32)),
+                                         ('sensor', np.uint16, 4096, 2000, (16, 16))):
+        t = rng.integers(0, high, size=(size, size), dtype=dtype)
+        p = rng.integers(0, high, size=tile, dtype=dtype)
+        for i, j in rng.integers(0, size - max(tile), size=(5, 2)):
+            t[i:i+tile[0], j:j+tile[1]] = p
+        start = time.perf_counter()
+        x = search_karp_rabin_2d(t, p)
+        hashed = time.perf_counter()
+        y = search_naive_2d(t, p)
+        naive = time.perf_counter()
+        assert x == y
+        line = '%-6s %dx%d tile %dx%d: %d matches, karp-rabin = %.3f s, naive shifted = %.3f s' % (name, size, size,
+            tile[0], tile[1], len(x), hashed - start, naive - hashed)
+        if size <= 1000:
+            assert search_loop_2d(t, p) == x
+            line = line + ', python loop = %.3f s' % (time.perf_counter() - naive)
+        print(line)
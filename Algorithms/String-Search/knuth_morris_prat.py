@@ -4,6 +4,11 @@
     Of special interest if the alphabet is small i.e., x = {0,1} (bits), x = {a,b,c} ...
 '''
 
+import struct
+from array import array
+
+from results import collect
+
 
 # arr[q] = max{k | k < q and P_{k} is a suffix of P_{q}}
 def kmp_prefix_func(p):
@@ -18,15 +23,14 @@ def kmp_prefix_func(p):
             k = arr[k-1]
         if p[k] == p[i]:
             k = k + 1
-        print 'i = ' + str(i) + ' k = ' + str(k)
         arr.append(k) # this is equal to arr[i] = k
     return arr
 
-def search_kmp(t,p):
+def iter_kmp(t,p, arr = None):
     n = len(t)
     m = len(p)
-    x = []
-    arr = kmp_prefix_func(p)
+    if arr == None:
+        arr = kmp_prefix_func(p)
     q = 0
     for i in range (0,n):
         while q > 0 and p[q] != t[i]:
@@ -34,12 +38,200 @@ def search_kmp(t,p):
         if p[q] == t[i]:
             q = q + 1
         if q == m:
-            x.append(i-(m-1) )
+            yield i-(m-1)
             q = arr[q-1]
-            
-    return x
+
+def search_kmp(t,p, arr = None, first_k = None, out = None):
+    return collect(iter_kmp(t, p, arr), first_k, out)
+
+def count_kmp(t,p, arr = None):
+    return sum(1 for _ in iter_kmp(t, p, arr))
+
+
+'''
+    Same automaton as search_kmp, but the state q survives between calls so the
+    text can arrive in chunks of any size (e.g., 1 MB blocks of a file).
+    Only the pattern and its prefix function are kept, O(m) memory.
+    Matches that straddle two chunks are found because q already remembers
+    the matched prefix at the end of the previous chunk.
+'''
+class StreamingKMP():
+
+    def __init__(self, p, arr = None):
+        self.p = p
+        self.m = len(p)
+        self.arr = arr if arr != None else kmp_prefix_func(p)
+        self.q = 0
+        self.offset = 0 # absolute position of the first char of the next chunk
+
+    # returns the absolute start positions of the matches ending inside chunk
+    def feed(self, chunk):
+        p = self.p
+        m = self.m
+        arr = self.arr
+        q = self.q
+        base = self.offset - (m - 1)
+        x = []
+        for i, c in enumerate(chunk):
+            while q > 0 and p[q] != c:
+                q = arr[q-1]
+            if p[q] == c:
+                q = q + 1
+            if q == m:
+                x.append(base + i)
+                q = arr[q-1]
+        self.q = q
+        self.offset = self.offset + len(chunk)
+        return x
+
+    def reset(self):
+        self.q = 0
+        self.offset = 0
+
+
+def search_kmp_stream(chunks, p):
+    matcher = StreamingKMP(p)
+    for chunk in chunks:
+        for pos in matcher.feed(chunk):
+            yield pos
+
+
+def read_chunks(f, chunk_size = 1 << 20):
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+# p must be bytes, the file is read in binary mode
+def search_kmp_file(path, p, chunk_size = 1 << 20):
+    with open(path, 'rb') as f:
+        for pos in search_kmp_stream(read_chunks(f, chunk_size), p):
+            yield pos
+
+
+'''
+    The same automaton compiled into a dense transition table, the failures are followed
+    once at build time instead of during the scan: delta[q][c] = state after reading c in state q.
+    The columns are the chars of the pattern plus one class for every other char, so the table
+    has (m+1) * (sigma+1) entries, small when the alphabet is (DNA, bits, hex).
+    The entries are stored premultiplied by the row width, a text char costs one lookup
+    q = delta[q + c] and no inner while. A bytes text is mapped to classes with bytes.translate.
+'''
+class KmpDFA():
+
+    magic = b'KDFA'
+    version = 1
+
+    def __init__(self, p, delta = None):
+        self.p = p
+        self.m = len(p)
+        assert self.m > 0
+        self.symbols = sorted(set(p))
+        self.sigma = len(self.symbols) + 1 # class 0: chars not in p
+        self.cls = {c: i + 1 for i, c in enumerate(self.symbols)}
+        if isinstance(p, (bytes, bytearray)):
+            classes = bytearray(256)
+            for c, k in self.cls.items():
+                classes[c] = k
+            self.classes = bytes(classes)
+        else:
+            self.classes = None
+        self.final = self.m * self.sigma
+        self.delta = delta if delta != None else self.build()
+
+    def build(self):
+        p = self.p
+        sigma = self.sigma
+        delta = array('l', [0]) * ((self.m + 1) * sigma)
+        delta[self.cls[p[0]]] = sigma
+        x = 0 # state reached by p[1:q], the failure of q
+        for q in range(1, self.m + 1):
+            row = q * sigma
+            delta[row:row+sigma] = delta[x:x+sigma]
+            if q < self.m:
+                c = self.cls[p[q]]
+                delta[row + c] = (q + 1) * sigma
+                x = delta[x + c]
+        return delta
+
+    def iter(self, t, block_size = 1 << 20):
+        delta = self.delta
+        final = self.final
+        base = 1 - self.m
+        q = 0
+        for start in range(0, len(t), block_size):
+            block = t[start:start+block_size]
+            if self.classes != None:
+                codes = bytes(block).translate(self.classes)
+            else:
+                cls = self.cls
+                codes = [cls.get(c, 0) for c in block]
+            for i, c in enumerate(codes):
+                q = delta[q + c]
+                if q == final:
+                    yield base + start + i
+
+    # magic, version, kind (0 bytes, 1 str), m, sigma, the pattern (utf-8 for str) and the table
+    def to_bytes(self):
+        kind = 0 if self.classes != None else 1
+        p = bytes(self.p) if kind == 0 else self.p.encode('utf-8')
+        header = self.magic + struct.pack('<IIIII', self.version, kind, len(p), self.sigma, self.delta.itemsize)
+        return header + p + self.delta.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = memoryview(data)
+        if bytes(data[:4]) != cls.magic:
+            raise ValueError('not a KMP DFA')
+        version, kind, length, sigma, itemsize = struct.unpack('<IIIII', data[4:24])
+        if version != cls.version:
+            raise ValueError('unsupported KMP DFA version ' + str(version))
+        p = bytes(data[24:24+length])
+        if kind == 1:
+            p = p.decode('utf-8')
+        delta = array('l')
+        if itemsize != delta.itemsize:
+            raise ValueError('KMP DFA saved with ' + str(itemsize) + ' byte entries')
+        delta.frombytes(data[24+length:])
+        dfa = cls(p, delta)
+        if dfa.sigma != sigma or len(delta) != (dfa.m + 1) * sigma:
+            raise ValueError('corrupted KMP DFA')
+        return dfa
 
 
+def iter_kmp_dfa(t, p, dfa = None):
+    if dfa == None:
+        dfa = KmpDFA(p)
+    return dfa.iter(t)
+
+def search_kmp_dfa(t, p, dfa = None, first_k = None, out = None):
+    return collect(iter_kmp_dfa(t, p, dfa), first_k, out)
+
+def count_kmp_dfa(t, p, dfa = None):
+    return sum(1 for _ in iter_kmp_dfa(t, p, dfa))
+
+
+def benchmark(n = 1 << 20, seed = 1):
+    import random
+    import time
+
+    rnd = random.Random(seed)
+    for name, alphabet in (('dna', b'ACGT'), ('binary', b'\x00\x01')):
+        t = bytes(rnd.choice(alphabet) for _ in range(n))
+        for m in (8, 32, 128):
+            p = t[n//2:n//2+m]
+            start = time.perf_counter()
+            dfa = KmpDFA(p)
+            built = time.perf_counter()
+            x = search_kmp_dfa(t, p, dfa)
+            scanned = time.perf_counter()
+            y = search_kmp(t, p)
+            end = time.perf_counter()
+            assert x == y
+            print('%-6s m = %3d: %5d matches, dfa build = %.4f s scan = %.3f s, kmp = %.3f s' % (name, m, len(x),
+                built - start, scanned - built, end - scanned))
+
 
 if __name__ == "__main__":
 
@@ -47,5 +239,14 @@ if __name__ == "__main__":
     p = 'ACABACA'
     positions = search_kmp(t,p)
     for p in positions:
-        print 'Pattern found at position = ' + str(p)
+        print('Pattern found at position = ' + str(p))
+
+    # the same text split in small chunks, matches may cross the boundaries
+    chunks = [t[i:i+5] for i in range(0, len(t), 5)]
+    for pos in search_kmp_stream(chunks, 'ACABACA'):
+        print('Pattern found at position = ' + str(pos) + ' (streaming)')
+
+    for pos in search_kmp_dfa(t, 'ACABACA'):
+        print('Pattern found at position = ' + str(pos) + ' (dfa)')
 
+    benchmark()
@@ -0,0 +1,182 @@
+'''
+    Incremental scan of append-only log files: every run only reads the bytes appended since the
+    previous one. The checkpoint keeps, for every file, the offset reached and the state of the
+    matcher there (q of StreamingKMP for one pattern, the node of AhoCorasickStream for several),
+    so a match that started before the old end of the file and ends in the new bytes is found,
+    the state already remembers its prefix. A run costs O(new data), not O(file).
+    Checkpoint file: magic, version, crc32 of the patterns (a checkpoint of other patterns is ignored),
+    then one fixed size record per file (device, inode, offset, state, length and crc32 of the first
+    bytes) followed by its path. It is written to a temporary file, fsynced and renamed over the old
+    one, a crash leaves either the old or the new checkpoint, never half of one.
+    A file whose inode changed (rotated), that is shorter than the offset (truncated) or whose first
+    bytes changed (rewritten) is scanned again from the start.
+'''
+
+import os
+import struct
+import zlib
+
+from aho_corasick import AhoCorasick, AhoCorasickStream
+from knuth_morris_prat import StreamingKMP, kmp_prefix_func, read_chunks
+
+magic = b'LGCP'
+version = 1
+header = struct.Struct('<4sIII')  # magic, version, crc32 of the patterns, number of records
+record = struct.Struct('<QQQQIIH') # device, inode, offset, state, head length, head crc32, path length
+head_size = 256
+
+
+def patterns_crc(patterns):
+    crc = 0
+    for p in patterns:
+        crc = zlib.crc32(struct.pack('<I', len(p)) + p, crc)
+    return crc
+
+def load_checkpoint(path, crc):
+    checkpoints = {}
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return checkpoints
+    if len(data) < header.size:
+        return checkpoints
+    file_magic, file_version, file_crc, count = header.unpack_from(data, 0)
+    if file_magic != magic or file_version != version or file_crc != crc:
+        return checkpoints
+    pos = header.size
+    for _ in range(count):
+        dev, ino, offset, state, head_len, head_crc, path_len = record.unpack_from(data, pos)
+        pos = pos + record.size
+        name = data[pos:pos+path_len].decode('utf-8', 'surrogateescape')
+        pos = pos + path_len
+        checkpoints[name] = (dev, ino, offset, state, head_len, head_crc)
+    return checkpoints
+
+def save_checkpoint(path, crc, checkpoints):
+    out = bytearray(header.pack(magic, version, crc, len(checkpoints)))
+    for name, entry in sorted(checkpoints.items()):
+        encoded = name.encode('utf-8', 'surrogateescape')
+        out.extend(record.pack(*(entry + (len(encoded),))))
+        out.extend(encoded)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(out)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory) # the rename itself
+    finally:
+        os.close(directory)
+
+
+class LogScanner():
+
+    def __init__(self, patterns, checkpoint_path, chunk_size = 1 << 20):
+        self.patterns = [bytes(p) for p in patterns]
+        self.checkpoint_path = checkpoint_path
+        self.chunk_size = chunk_size
+        self.crc = patterns_crc(self.patterns)
+        if len(self.patterns) == 1:
+            self.prefix = kmp_prefix_func(self.patterns[0])
+            self.automaton = None
+        else:
+            self.automaton = AhoCorasick(self.patterns)
+        self.checkpoints = load_checkpoint(checkpoint_path, self.crc)
+        self.bytes_read = 0
+
+    def matcher(self, q, offset):
+        if self.automaton != None:
+            return AhoCorasickStream(self.automaton, q, offset)
+        kmp = StreamingKMP(self.patterns[0], self.prefix)
+        kmp.q = q
+        kmp.offset = offset
+        return kmp
+
+    # (pattern_id, offset) of the matches in the bytes appended since the last checkpoint of path
+    def scan(self, path, save = True):
+        name = os.path.abspath(path)
+        hits = []
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            head_len = min(st.st_size, head_size)
+            head = f.read(head_len)
+            entry = self.checkpoints.get(name)
+            offset = 0
+            q = 0
+            if entry != None:
+                dev, ino, old_offset, old_q, old_head_len, old_head_crc = entry
+                same_file = (dev, ino) == (st.st_dev, st.st_ino) and old_offset <= st.st_size
+                if same_file and zlib.crc32(head[:old_head_len]) == old_head_crc:
+                    offset = old_offset
+                    q = old_q
+            matcher = self.matcher(q, offset)
+            f.seek(offset)
+            for chunk in read_chunks(f, self.chunk_size):
+                self.bytes_read = self.bytes_read + len(chunk)
+                found = matcher.feed(chunk)
+                if self.automaton == None:
+                    found = [(0, pos) for pos in found]
+                hits.extend(found)
+            self.checkpoints[name] = (st.st_dev, st.st_ino, matcher.offset, matcher.q, head_len, zlib.crc32(head))
+        if save:
+            self.save()
+        return hits
+
+    def scan_all(self, paths):
+        hits = {}
+        for path in paths:
+            hits[path] = self.scan(path, save = False)
+        self.save()
+        return hits
+
+    def save(self):
+        save_checkpoint(self.checkpoint_path, self.crc, self.checkpoints)
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+    import time
+
+    rnd = random.Random(1)
+    directory = tempfile.mkdtemp()
+    log = os.path.join(directory, 'app.log')
+    checkpoint = os.path.join(directory, 'scan.ckpt')
+    patterns = [b'ERROR disk full', b'segfault at', b'OOM killer']
+    words = [b'INFO', b'request', b'served', b'user', b'login', b'cache', b'miss', b'GET', b'/api', b'200']
+
+    content = bytearray()
+    found = []
+    for run in range(10):
+        with open(log, 'ab') as f:
+            lines = bytearray()
+            for _ in range(20000):
+                if rnd.random() < 0.001:
+                    lines.extend(rnd.choice(patterns) + b'\n')
+                else:
+                    lines.extend(b' '.join(rnd.choice(words) for _ in range(6)) + b'\n')
+            if run % 2 == 0: # the run ends in the middle of a match
+                lines.extend(b'ERROR disk')
+            else:
+                lines[0:0] = b' full\n'
+            f.write(lines)
+            content.extend(lines)
+        scanner = LogScanner(patterns, checkpoint) # a new process every run
+        start = time.perf_counter()
+        hits = scanner.scan(log)
+        elapsed = time.perf_counter() - start
+        found.extend(hits)
+        print('run %d: file = %.1f MB read = %.2f MB %d new matches in %.3f s, checkpoint = %d bytes' % (run,
+            len(content) / 1e6, scanner.bytes_read / 1e6, len(hits), elapsed, os.path.getsize(checkpoint)))
+    assert found == AhoCorasick(patterns).search(bytes(content))
+
+    # rotation: the file is moved away and a new one starts from scratch
+    os.rename(log, log + '.1')
+    with open(log, 'wb') as f:
+        f.write(b'segfault at 0x0\n')
+    hits = LogScanner(patterns, checkpoint).scan(log)
+    assert hits == [(1, 0)]
+    print('after rotation: %d match at offset %d' % (len(hits), hits[0][1]))
@@ -0,0 +1,52 @@
+'''
+    Search a pattern in a file without loading it in memory.
+    The file is mapped with mmap and the bytes mode of Horspool/Sunday runs directly over the mapping,
+    t[i] reads one byte of the page cache, no copy of the file is ever made. The kernel pages the file
+    in and out as the window moves, so files much bigger than the RAM can be scanned.
+    Bytes mode, the *_bytes matchers of horspool.py, sunday.py and boyer_moore.py: t and p are bytes,
+    bytearray, memoryview or mmap, so t[i] is already an int in [0,255] and the shift tables have 256
+    slots stored in a compact array instead of a list indexed by ord(c). They take start/end: only the
+    windows inside t[start:end] are checked and the positions returned are absolute, so a file can be
+    cut in ranges (parallel_search.py) without slicing the mapping.
+'''
+
+import mmap
+import os
+
+from horspool import search_horspool_bytes
+from sunday import search_sunday_bytes
+
+searchers = {
+    'horspool': search_horspool_bytes,
+    'sunday': search_sunday_bytes,
+}
+
+def open_mapping(f):
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mm, 'madvise'): # python >= 3.8 and only some platforms
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+    return mm
+
+# p must be bytes
+def search_file(path, p, algorithm = 'horspool', out = None):
+    search = searchers[algorithm]
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < len(p): # mmap can not map an empty file
+            return out if out != None else []
+        mm = open_mapping(f)
+        try:
+            return search(mm, p, out = out)
+        finally:
+            mm.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        print('usage: mmap_search.py file pattern [horspool|sunday]')
+        sys.exit(1)
+    algorithm = sys.argv[3] if len(sys.argv) > 3 else 'horspool'
+    positions = search_file(sys.argv[1], sys.argv[2].encode(), algorithm)
+    for p in positions:
+        print('Pattern found at position = ' + str(p))
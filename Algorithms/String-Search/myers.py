@@ -0,0 +1,197 @@
+'''
+    Myers' bit-vector algorithm for approximate matching of long patterns (edit distance <= k)
+    Paper: Gene Myers. 1999. A fast bit-vector algorithm for approximate string matching based on dynamic programming. J. ACM 46, 3 (May 1999), 395-415.
+    Paper: Heikki Hyyrö. 2003. A bit-vector algorithm for computing Levenshtein and Damerau edit distances. Nordic Journal of Computing 10, 1, 29-39.
+    Same dynamic programming as naive_edits of bitap.py (column j = distances of the prefixes of p
+    to the best substring of t ending at j), but a column is stored as its vertical deltas, +1 in Pv
+    and -1 in Mv, so a whole column is computed with a few word operations.
+    The pattern is cut in blocks of w = 64 rows. Block b passes the delta of its last row (hout) to
+    block b+1, which is the only link between the words, the way a carry goes from one word to the next.
+    Bitap costs k+1 words per char, here the cost does not depend on k, and with the cutoff of
+    Ukkonen only the blocks that can still hold a value <= k are computed: the blocks below the
+    last active one have all their values > k.
+'''
+
+from array import array
+
+from results import collect
+
+word_size = 64
+
+
+# peq[c][b]: bit r set if p[b*w + r] == c. widths[b] = rows of block b (the last one may be shorter)
+def pre_process_myers(p, w = word_size):
+    m = len(p)
+    assert m > 0
+    blocks = (m + w - 1) // w
+    peq = {}
+    for j, c in enumerate(p):
+        if c not in peq:
+            peq[c] = [0] * blocks
+        peq[c][j // w] |= 1 << (j % w)
+    widths = [min(w, m - b * w) for b in range(blocks)]
+    return peq, widths
+
+
+'''
+    State of the scan: the words of the last column and the distance at the last row of every
+    block, so the text can arrive in chunks. feed(chunk) returns (end, distance) for every end
+    position (absolute) whose edit distance to p is <= k. With k = None there is no cutoff and
+    every position is returned.
+'''
+class MyersStream():
+
+    def __init__(self, p, k = None, tables = None, offset = 0):
+        self.m = len(p)
+        self.k = k
+        self.peq, self.widths = tables if tables != None else pre_process_myers(p)
+        self.masks = [(1 << w) - 1 for w in self.widths]
+        self.highs = [1 << (w - 1) for w in self.widths]
+        self.zero = [0] * len(self.widths)
+        self.last = len(self.widths) - 1
+        self.reset(offset)
+
+    def reset(self, offset = 0):
+        self.Pv = list(self.masks) # first column: p[0:r+1] against the empty string costs r+1
+        self.Mv = [0] * len(self.widths)
+        self.score = []
+        total = 0
+        for w in self.widths:
+            total = total + w
+            self.score.append(total)
+        self.y = self.last if self.k == None else min(self.k // self.widths[0], self.last) # last active block
+        self.offset = offset
+
+    def feed(self, chunk):
+        peq = self.peq
+        zero = self.zero
+        masks = self.masks
+        highs = self.highs
+        widths = self.widths
+        Pv = self.Pv
+        Mv = self.Mv
+        score = self.score
+        k = self.k
+        last = self.last
+        y = self.y
+        x = []
+        for i, c in enumerate(chunk):
+            eqs = peq.get(c, zero)
+            carry = 0 # searching: the top row is 0 everywhere, a match can start anywhere
+            b = 0
+            grown = False
+            while True:
+                pv = Pv[b]
+                mv = Mv[b]
+                mask = masks[b]
+                eq = eqs[b]
+                xv = eq | mv
+                if carry < 0:
+                    eq = eq | 1
+                xh = (((eq & pv) + pv) ^ pv) | eq
+                ph = mv | (~(xh | pv) & mask)
+                mh = pv & xh
+                if ph & highs[b]:
+                    hout = 1
+                elif mh & highs[b]:
+                    hout = -1
+                else:
+                    hout = 0
+                ph = (ph << 1) & mask
+                mh = (mh << 1) & mask
+                if carry < 0:
+                    mh = mh | 1
+                elif carry > 0:
+                    ph = ph | 1
+                Pv[b] = mh | (~(xv | ph) & mask)
+                Mv[b] = ph & xv
+                score[b] = score[b] + hout
+                carry = hout
+                if b < y:
+                    b = b + 1
+                    continue
+                # the block below becomes active if its first row can reach a value <= k
+                if not grown and y < last and score[y] - hout <= k and (eqs[y+1] & 1 or hout < 0):
+                    y = y + 1
+                    Pv[y] = masks[y]
+                    Mv[y] = 0
+                    score[y] = score[y-1] - hout + widths[y]
+                    b = y
+                    grown = True
+                    continue
+                break
+            if k == None:
+                x.append((self.offset + i, score[last]))
+                continue
+            while y > 0 and score[y] >= k + widths[y]:
+                y = y - 1
+            if y == last and score[y] <= k:
+                x.append((self.offset + i, score[y]))
+        self.y = y
+        self.offset = self.offset + len(chunk)
+        return x
+
+
+def iter_myers(t, p, k, tables = None, chunk_size = 1 << 16):
+    stream = MyersStream(p, k, tables)
+    for start in range(0, len(t), chunk_size):
+        for hit in stream.feed(t[start:start+chunk_size]):
+            yield hit
+
+def search_myers(t, p, k, tables = None, first_k = None, out = None):
+    return collect(iter_myers(t, p, k, tables), first_k, out)
+
+def count_myers(t, p, k, tables = None):
+    return sum(1 for _ in iter_myers(t, p, k, tables))
+
+# distances[j] = smallest edit distance between p and a substring of t ending at j, for every j
+def distances_myers(t, p, tables = None):
+    return array('l', [d for _, d in MyersStream(p, None, tables).feed(t)])
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from bitap import naive_edits, search_bitap_edits
+
+    t = 'AIABBABABRQMYOAABBBBABABYOSGBBGTVBHABBABABSUJKSKKHKJABBABBABABABAYRQMYOIUHKJHJHSDASDASDNIAURTO ABBABABNLK'
+    for end, d in search_myers(t, 'ABBABBAB', 1):
+        print('Pattern ends at position = ' + str(end) + ' with ' + str(d) + ' errors')
+
+    # long patterns: mutated copies of a packet payload (hex) planted in a random hex text
+    rnd = random.Random(1)
+    n = 100000
+    t = ''.join(rnd.choice('0123456789abcdef') for _ in range(n))
+    for m, k in ((200, 10), (500, 25), (1000, 50)):
+        p = ''.join(rnd.choice('0123456789abcdef') for _ in range(m))
+        text = list(t)
+        for pos in range(rnd.randint(0, 5000), n - 2 * m, n // 4):
+            copy = list(p)
+            for _ in range(k // 2):
+                e = rnd.randrange(3)
+                j = rnd.randrange(len(copy))
+                if e == 0:
+                    copy[j] = rnd.choice('0123456789abcdef')
+                elif e == 1:
+                    copy.insert(j, rnd.choice('0123456789abcdef'))
+                else:
+                    del copy[j]
+            text[pos:pos+len(copy)] = copy
+        text = ''.join(text)
+
+        start = time.perf_counter()
+        hits = search_myers(text, p, k)
+        myers_end = time.perf_counter()
+        assert hits == search_bitap_edits(text, p, k)
+        bitap_end = time.perf_counter()
+        line = 'n = %d m = %d k = %d: %d end positions, myers = %.3f s, bitap = %.3f s' % (n, m, k, len(hits),
+            myers_end - start, bitap_end - myers_end)
+        if m <= 200:
+            assert hits == naive_edits(text, p, k)
+            line = line + ', dynamic programming = %.3f s' % (time.perf_counter() - bitap_end)
+        print(line)
+
+    window = text[:20000]
+    start = time.perf_counter()
+    d = distances_myers(window, p)
+    print('distance array of a %d char window, m = %d: %.3f s, min = %d' % (len(window), len(p), time.perf_counter() - start, min(d)))
@@ -0,0 +1,77 @@
+'''
+    Packed filter for short patterns with NumPy, the Python cousin of epsm.c
+    Paper: Faro, Simone & Kulekci, M.. (2012). Fast Packed String Matching for Short Patterns.
+    epsm.c compares 16 text bytes at a time against the pattern with SSE. Here the whole buffer
+    (in blocks) is the "register": the first and the last byte of every window are compared with
+    one array operation each, the surviving candidates are filtered with a q-gram fingerprint
+    (the first 4 bytes of the window packed in a uint32) and the few left are verified byte by
+    byte, again in bulk over all the candidates.
+    t must be bytes like (bytes, bytearray, memoryview, mmap) and p bytes.
+'''
+
+import numpy as np
+
+block_size = 1 << 22 # windows checked per round, bounds the temporary arrays
+q = 4
+
+
+def fingerprint(buf, idx, length):
+    f = np.zeros(len(idx), dtype=np.uint32)
+    for j in range(length):
+        f |= buf[idx + j].astype(np.uint32) << np.uint32(8 * j)
+    return f
+
+def search_block(buf, p, first, last_byte, fp, start, stop):
+    m = len(p)
+    windows = stop - start
+    cand = buf[start:start+windows] == first
+    cand &= buf[start+m-1:start+m-1+windows] == last_byte
+    idx = np.flatnonzero(cand) + start
+    qq = min(q, m)
+    if len(idx) > 0 and m > 2:
+        idx = idx[fingerprint(buf, idx, qq) == fp]
+    for j in range(qq, m - 1): # verification of what the fingerprint did not cover
+        if len(idx) == 0:
+            break
+        idx = idx[buf[idx + j] == p[j]]
+    return idx
+
+def search_packed(t, p, start = 0, end = None, out = None):
+    buf = np.frombuffer(t, dtype=np.uint8)
+    if end == None:
+        end = len(buf)
+    m = len(p)
+    x = out if out != None else []
+    if m == 0 or end - start < m:
+        return x
+    pat = np.frombuffer(p, dtype=np.uint8)
+    fp = fingerprint(pat, np.zeros(1, dtype=np.intp), min(q, m))[0]
+    last = end - m + 1 # one past the last window
+    for s in range(start, last, block_size):
+        idx = search_block(buf, p, p[0], p[m-1], fp, s, min(s + block_size, last))
+        x.extend(idx.tolist() if out == None else idx) # typed buffers take the array as it is
+    return x
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from sunday import search_sunday_bytes
+
+    t = b'AIABBABABRQMYOAABBBBABABYOSGBBGTVBHABBABABSUJKSKKHKJABBABBABABABAYRQMYOIUHKJHJHSDASDASDNIAURTO ABBABABNLK'
+    for pos in search_packed(t, b'ABBABAB'):
+        print('Pattern found at position = ' + str(pos))
+
+    rnd = random.Random(1)
+    n = 1 << 23
+    t = bytes(rnd.getrandbits(8) for _ in range(n))
+    for m in (2, 4, 8, 15):
+        p = t[n // 2:n // 2 + m]
+        start = time.perf_counter()
+        ref = search_sunday_bytes(t, p)
+        sunday = time.perf_counter() - start
+        start = time.perf_counter()
+        res = search_packed(t, p)
+        packed = time.perf_counter() - start
+        assert res == ref
+        print('m = %2d matches = %5d sunday = %.3f s packed = %.3f s speedup = %.1fx' % (m, len(res), sunday, packed, sunday / packed))
@@ -0,0 +1,137 @@
+'''
+    Parallel search over shards of a big text or file.
+    The text is cut in shards [start, end) and every shard is scanned up to end + m - 1, so a match
+    that starts in the shard but ends in the next one is still seen. A shard only reports the matches
+    that start inside it, therefore the overlap never produces duplicates and concatenating the
+    results of the shards in order gives the sorted list of positions.
+    The workers never receive the text: a file is mmap'd by every worker and an in-memory text is
+    copied once to shared memory, the shards are (start, end) pairs.
+'''
+
+import mmap
+import os
+from array import array
+from multiprocessing import Pool
+from multiprocessing import shared_memory
+
+from boyer_moore import pre_process_delta_1_bytes, pre_process_delta_2, search_boyer_moore_bytes
+from horspool import pre_process_horspool_bytes, search_horspool_bytes
+from sunday import pre_process_sunday_bytes, search_sunday_bytes
+
+algorithms = {
+    'boyer_moore': (lambda p: (pre_process_delta_1_bytes(p), pre_process_delta_2(p)), search_boyer_moore_bytes),
+    'horspool': (lambda p: (pre_process_horspool_bytes(p),), search_horspool_bytes),
+    'sunday': (lambda p: (pre_process_sunday_bytes(p),), search_sunday_bytes),
+}
+
+shards_per_worker = 4 # more shards than workers, so a slow shard does not leave cores idle
+
+# delta_2 needs m > 1, a one byte pattern goes to horspool (a plain scan for that byte)
+def resolve(algorithm, p):
+    if algorithm not in algorithms:
+        raise ValueError('unknown algorithm ' + repr(algorithm))
+    if algorithm == 'boyer_moore' and len(p) == 1:
+        return 'horspool'
+    return algorithm
+
+
+def make_shards(n, m, workers, shard_size = None):
+    if shard_size == None:
+        shard_size = max(n // (workers * shards_per_worker) + 1, m)
+    return [(start, min(start + shard_size, n)) for start in range(0, n, shard_size)]
+
+
+# Worker side. The pool initializer opens the buffer once per process,
+# every task only carries the bounds of its shard.
+worker = {}
+
+def init_file_worker(path, algorithm, p, tables):
+    f = open(path, 'rb')
+    worker['buffer'] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    worker['file'] = f
+    init_search(algorithm, p, tables)
+
+def init_shm_worker(name, n, algorithm, p, tables):
+    shm = shared_memory.SharedMemory(name=name)
+    worker['buffer'] = shm.buf[:n]
+    worker['shm'] = shm
+    init_search(algorithm, p, tables)
+
+def init_search(algorithm, p, tables):
+    worker['search'] = algorithms[algorithm][1]
+    worker['p'] = p
+    worker['tables'] = tables
+
+def search_shard(shard):
+    start, end = shard
+    t = worker['buffer']
+    p = worker['p']
+    end = min(end + len(p) - 1, len(t))
+    return worker['search'](t, p, *worker['tables'], start=start, end=end, out=array('q')) # pickled as raw bytes
+
+
+def run(n, p, algorithm, workers, initializer, initargs, shard_size, out):
+    if workers == None:
+        workers = os.cpu_count() or 1
+    shards = make_shards(n, len(p), workers, shard_size)
+    x = out if out != None else []
+    with Pool(workers, initializer, initargs) as pool:
+        for positions in pool.imap(search_shard, shards): # imap keeps the order of the shards
+            x.extend(positions)
+    return x
+
+# p must be bytes
+def search_file_parallel(path, p, algorithm = 'horspool', workers = None, shard_size = None, out = None):
+    n = os.path.getsize(path)
+    if n < len(p):
+        return out if out != None else []
+    algorithm = resolve(algorithm, p)
+    tables = algorithms[algorithm][0](p)
+    return run(n, p, algorithm, workers, init_file_worker, (path, algorithm, p, tables), shard_size, out)
+
+# t and p must be bytes like objects
+def search_parallel(t, p, algorithm = 'horspool', workers = None, shard_size = None, out = None):
+    n = len(t)
+    if n < len(p):
+        return out if out != None else []
+    algorithm = resolve(algorithm, p)
+    tables = algorithms[algorithm][0](p)
+    shm = shared_memory.SharedMemory(create=True, size=n)
+    try:
+        shm.buf[:n] = t
+        return run(n, p, algorithm, workers, init_shm_worker, (shm.name, n, algorithm, p, tables), shard_size, out)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+    import time
+
+    rnd = random.Random(1)
+    p = b'ABBABABXYZQ'
+    block = bytearray(rnd.getrandbits(8) for _ in range(1 << 20))
+    for i in range(0, len(block) - len(p), 4099):
+        block[i:i+len(p)] = p
+    path = os.path.join(tempfile.mkdtemp(), 'corpus.bin')
+    with open(path, 'wb') as f:
+        for _ in range(16):
+            f.write(block)
+
+    for algorithm in sorted(algorithms):
+        reference = None
+        for workers in sorted(set([1, 2, os.cpu_count() or 1])):
+            start = time.perf_counter()
+            positions = search_file_parallel(path, p, algorithm, workers)
+            elapsed = time.perf_counter() - start
+            if reference == None:
+                reference = positions
+            assert positions == reference
+            print('%-12s workers = %2d matches = %d time = %.3f s' % (algorithm, workers, len(positions), elapsed))
+    os.remove(path)
+
+    # a one byte pattern: boyer_moore goes to horspool instead of failing in pre_process_delta_2
+    t = bytes(block[:1 << 16])
+    assert search_parallel(t, b'Q', 'boyer_moore', 2) == [i for i, c in enumerate(t) if c == ord('Q')]
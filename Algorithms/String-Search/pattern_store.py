@@ -0,0 +1,259 @@
+'''
+    On-disk store of compiled patterns, so a scanner does not rebuild its tables at every restart.
+    save_store() builds the tables of every (bytes) pattern once and writes them in one file:
+        magic, version, length of the JSON header, crc32 of the rest of the file
+        JSON header: algorithm, count, byte order, dtype/itemsize/offset/length of every array
+        arrays in the native byte order, every one at a 64 byte aligned offset
+    The tables of all the patterns are concatenated in one int32 array, table_offsets[i] is where
+    the tables of pattern i start (CSR layout). With automaton = True the Aho-Corasick automaton of the
+    whole set is also stored in CSR form: the edges of node q are edge_label/edge_target[edge_row[q]:edge_row[q+1]]
+    sorted by label, the outputs are out_ids[out_row[q]:out_row[q+1]].
+    PatternStore.open() maps the file, checks the header (and the crc32 if verify) and makes memoryviews
+    of the arrays: nothing is decoded per pattern. get(i) slices the views of pattern i and wraps them
+    in a CompiledPattern, the search functions index a memoryview like the array they were built with.
+'''
+
+import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+
+from aho_corasick import AhoCorasick
+from compiled import CompiledPattern, algorithms_bytes
+from knuth_morris_prat import KmpDFA
+from results import collect
+
+magic = b'CPST'
+version = 1
+prefix = struct.Struct('<4sIII') # magic, version, header length, crc32
+
+# algorithm -> (tables -> flat list of ints, (pattern, view) -> tables)
+layouts = {
+    'horspool': (lambda tables: list(tables[0]), lambda p, v: (v,)),
+    'sunday': (lambda tables: list(tables[0]), lambda p, v: (v,)),
+    'boyer_moore': (lambda tables: list(tables[0]) + list(tables[1]), lambda p, v: (v[:256], v[256:])),
+    'turbo_boyer_moore': (lambda tables: list(tables[0]) + list(tables[1]), lambda p, v: (v[:256], v[256:])),
+    'kmp': (lambda tables: list(tables[0]), lambda p, v: (v,)),
+    'kmp_dfa': (lambda tables: list(tables[0].delta), lambda p, v: (KmpDFA(p, v),)),
+    'two_way': (lambda tables: list(tables[0]), lambda p, v: ((v[0], v[1]),)),
+}
+
+
+def align(offset):
+    return (offset + 63) & ~63
+
+def automaton_arrays(ac):
+    edge_row = [0]
+    edge_label = bytearray()
+    edge_target = []
+    out_row = [0]
+    out_ids = []
+    for q in range(len(ac.goto)):
+        for c in sorted(ac.goto[q]):
+            edge_label.append(c)
+            edge_target.append(ac.goto[q][c])
+        edge_row.append(len(edge_target))
+        out_ids.extend(ac.out[q])
+        out_row.append(len(out_ids))
+    return {
+        'edge_row': ('i', edge_row), 'edge_label': ('B', edge_label), 'edge_target': ('i', edge_target),
+        'fail': ('i', ac.fail), 'dict_link': ('i', ac.dict_link), 'out_row': ('i', out_row),
+        'out_ids': ('i', out_ids), 'lens': ('i', ac.lens),
+    }
+
+def save_store(path, patterns, algorithm = 'horspool', automaton = False):
+    if algorithm not in layouts:
+        raise ValueError('unknown algorithm ' + repr(algorithm))
+    pre_process = algorithms_bytes[algorithm][0]
+    encode = layouts[algorithm][0]
+    patterns = [bytes(p) for p in patterns]
+    blob = bytearray()
+    pattern_offsets = [0]
+    tables = []
+    table_offsets = [0]
+    for p in patterns:
+        blob.extend(p)
+        pattern_offsets.append(len(blob))
+        tables.extend(encode(pre_process(p)))
+        table_offsets.append(len(tables))
+    arrays = {
+        'patterns': ('B', blob), 'pattern_offsets': ('q', pattern_offsets),
+        'tables': ('i', tables), 'table_offsets': ('q', table_offsets),
+    }
+    if automaton:
+        arrays.update(automaton_arrays(AhoCorasick(patterns)))
+
+    layout = {}
+    chunks = []
+    offset = 0
+    for name, (typecode, values) in arrays.items():
+        data = array(typecode, values).tobytes() # native order, what open() casts the views to
+        layout[name] = {'dtype': typecode, 'itemsize': array(typecode).itemsize, 'offset': offset, 'length': len(values)}
+        chunks.append((offset, data))
+        offset = align(offset + len(data))
+    header = json.dumps({'algorithm': algorithm, 'count': len(patterns), 'byteorder': sys.byteorder,
+                         'arrays': layout}).encode()
+    start = align(prefix.size + len(header))
+    body = bytearray(start - prefix.size + offset)
+    body[:len(header)] = header
+    for offset, data in chunks:
+        pos = start - prefix.size + offset
+        body[pos:pos+len(data)] = data
+    with open(path, 'wb') as f:
+        f.write(prefix.pack(magic, version, len(header), zlib.crc32(body)))
+        f.write(body)
+
+
+class PatternStore():
+
+    def __init__(self, mm, header, views):
+        self.mm = mm
+        self.algorithm = header['algorithm']
+        self.count = header['count']
+        self.views = views
+        self.decode = layouts[self.algorithm][1]
+        self.automaton = StoredAhoCorasick(views) if 'edge_row' in views else None
+        self.ids = None
+
+    @classmethod
+    def open(cls, path, verify = True):
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(mm) < prefix.size:
+            raise ValueError(path + ' is not a pattern store')
+        file_magic, file_version, header_len, crc = prefix.unpack(mm[:prefix.size])
+        if file_magic != magic:
+            raise ValueError(path + ' is not a pattern store')
+        if file_version != version:
+            raise ValueError('unsupported pattern store version ' + str(file_version))
+        view = memoryview(mm)
+        if verify and zlib.crc32(view[prefix.size:]) != crc:
+            raise ValueError(path + ': checksum mismatch')
+        header = json.loads(bytes(mm[prefix.size:prefix.size+header_len]).decode())
+        # the views are cast in the native order, a store written on another byte order is rejected
+        if header.get('byteorder', 'little') != sys.byteorder:
+            raise ValueError(path + ': written on a ' + header.get('byteorder', 'little') + ' endian host')
+        start = align(prefix.size + header_len)
+        views = {}
+        for name, d in header['arrays'].items():
+            pos = start + d['offset']
+            size = array(d['dtype']).itemsize
+            if d.get('itemsize', size) != size:
+                raise ValueError(path + ': array ' + name + ' has items of ' + str(d['itemsize']) + ' bytes')
+            views[name] = view[pos:pos + d['length'] * size].cast(d['dtype'])
+        return cls(mm, header, views)
+
+    def __len__(self):
+        return self.count
+
+    def pattern(self, i):
+        offsets = self.views['pattern_offsets']
+        return bytes(self.views['patterns'][offsets[i]:offsets[i+1]])
+
+    def get(self, i):
+        offsets = self.views['table_offsets']
+        p = self.pattern(i)
+        tables = self.decode(p, self.views['tables'][offsets[i]:offsets[i+1]])
+        return CompiledPattern(p, self.algorithm, tables)
+
+    # pattern -> id, the map is built on the first call
+    def index(self, p):
+        if self.ids == None:
+            self.ids = {self.pattern(i): i for i in range(self.count)}
+        return self.ids[bytes(p)]
+
+    def close(self):
+        self.views = None
+        self.automaton = None
+        self.mm = None # the mapping is closed when the last memoryview of it is released
+
+
+'''
+    Aho-Corasick over the CSR arrays of a store: the child of q through c is found by binary search
+    among the sorted labels of q instead of a dict lookup. Same results as AhoCorasick.search.
+'''
+class StoredAhoCorasick():
+
+    def __init__(self, views):
+        self.edge_row = views['edge_row']
+        self.edge_label = views['edge_label']
+        self.edge_target = views['edge_target']
+        self.fail = views['fail']
+        self.dict_link = views['dict_link']
+        self.out_row = views['out_row']
+        self.out_ids = views['out_ids']
+        self.lens = views['lens']
+
+    def iter(self, t):
+        edge_row = self.edge_row
+        edge_label = self.edge_label
+        edge_target = self.edge_target
+        fail = self.fail
+        dict_link = self.dict_link
+        out_row = self.out_row
+        out_ids = self.out_ids
+        lens = self.lens
+        q = 0
+        for i, c in enumerate(t):
+            while True:
+                hi = edge_row[q+1]
+                k = bisect_left(edge_label, c, edge_row[q], hi)
+                if k < hi and edge_label[k] == c:
+                    q = edge_target[k]
+                    break
+                if q == 0:
+                    break
+                q = fail[q]
+            o = q if out_row[q] != out_row[q+1] else dict_link[q]
+            while o > 0:
+                for j in range(out_row[o], out_row[o+1]):
+                    pid = out_ids[j]
+                    yield pid, i - lens[pid] + 1
+                o = dict_link[o]
+
+    def search(self, t, first_k = None, out = None):
+        return collect(self.iter(t), first_k, out)
+
+
+if __name__ == "__main__":
+    import os
+    import random
+    import tempfile
+    import time
+    from compiled import compile
+
+    rnd = random.Random(1)
+    alphabet = b'abcdefghijklmnopqrstuvwxyz0123456789/.-_'
+    t = bytes(rnd.choice(alphabet) for _ in range(1 << 16))
+    patterns = list(set(bytes(rnd.choice(alphabet) for _ in range(rnd.randint(6, 16))) for _ in range(20000)))
+    patterns[:100] = [t[pos:pos+10] for pos in range(0, 100 * 600, 600)] # some of them are in the text
+    directory = tempfile.mkdtemp()
+
+    for algorithm in ('horspool', 'boyer_moore', 'kmp', 'two_way'):
+        path = os.path.join(directory, algorithm + '.store')
+        start = time.perf_counter()
+        compiled = [compile(p, algorithm) for p in patterns]
+        built = time.perf_counter()
+        save_store(path, patterns, algorithm, automaton = algorithm == 'horspool')
+        saved = time.perf_counter()
+        store = PatternStore.open(path)
+        loaded = time.perf_counter()
+        for i in range(0, len(patterns), 97):
+            assert store.get(i).search(t) == compiled[i].search(t)
+        line = '%-12s %d patterns: compile = %.2f s save = %.2f s open = %.4f s (%.1f MB)' % (algorithm, len(patterns),
+            built - start, saved - built, loaded - saved, os.path.getsize(path) / 1e6)
+        if store.automaton != None:
+            start = time.perf_counter()
+            ac = AhoCorasick(patterns)
+            built = time.perf_counter()
+            hits = store.automaton.search(t)
+            scanned = time.perf_counter()
+            assert hits == ac.search(t)
+            line = line + ', automaton build = %.2f s stored automaton scan = %.3f s (%d hits)' % (built - start,
+                scanned - built, len(hits))
+        print(line)
+        store.close()
+        os.remove(path)
@@ -0,0 +1,280 @@
+'''
+    Scan the payloads of the packets of a pcap file with the Two-Way matcher.
+    The file is read one record at a time into a reused buffer, the headers (Ethernet/VLAN,
+    Linux cooked, raw IP; IPv4/IPv6; TCP/UDP) are skipped and the payload is a memoryview of
+    that buffer, nothing is copied. Two-Way only needs the critical factorization of the pattern,
+    so the extra memory is constant whatever the size of the packets.
+    A match may also cross the boundary between two packets of the same flow (same protocol,
+    addresses and ports, one direction): every flow keeps the last m-1 bytes of its payloads and
+    only the junction tail + payload[:m-1] (at most 2m-2 bytes) is searched again.
+    The packets are taken in capture order, TCP retransmissions and reordering are not undone.
+    IP fragments are not reassembled: every fragment (IPv4 MF flag or offset, IPv6 fragment header
+    with M flag or offset) is skipped, the first one too, so no part of a fragmented datagram is
+    read as a TCP/UDP header or enters the stream of its flow.
+'''
+
+import struct
+from collections import OrderedDict, namedtuple
+
+from two_way_matching import critical_factorization, iter_two_way
+
+Hit = namedtuple('Hit', ['pattern_id', 'flow', 'packet', 'flow_offset', 'timestamp'])
+Flow = namedtuple('Flow', ['protocol', 'src', 'sport', 'dst', 'dport'])
+
+pcap_magic = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1e-6),
+    b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+    b'\x4d\x3c\xb2\xa1': ('<', 1e-9),
+    b'\xa1\xb2\x3c\x4d': ('>', 1e-9),
+}
+
+linktype_ethernet = 1
+linktype_raw = 101
+linktype_linux_sll = 113
+linktype_ipv4 = 228
+linktype_ipv6 = 229
+
+
+# Yields (timestamp, linktype, frame), frame is a memoryview valid until the next packet
+def read_pcap(f):
+    header = f.read(24)
+    if len(header) < 24 or header[:4] not in pcap_magic:
+        raise ValueError('not a pcap file')
+    order, resolution = pcap_magic[header[:4]]
+    snaplen, linktype = struct.unpack(order + 'II', header[16:24])
+    record = struct.Struct(order + 'IIII')
+    buf = bytearray(max(snaplen, 65535))
+    view = memoryview(buf)
+    while True:
+        rh = f.read(16)
+        if len(rh) < 16:
+            return
+        sec, frac, incl_len, orig_len = record.unpack(rh)
+        if incl_len > len(buf):
+            buf = bytearray(incl_len)
+            view = memoryview(buf)
+        if f.readinto(view[:incl_len]) < incl_len:
+            return # truncated capture
+        yield sec + frac * resolution, linktype, view[:incl_len]
+
+# Returns (flow, payload) or None if the packet is not TCP/UDP over IP
+def parse_frame(linktype, frame):
+    if linktype == linktype_ethernet:
+        if len(frame) < 14:
+            return None
+        off = 12
+        ethertype = frame[off] << 8 | frame[off+1]
+        while ethertype in (0x8100, 0x88a8) and len(frame) >= off + 6: # VLAN tags
+            off = off + 4
+            ethertype = frame[off] << 8 | frame[off+1]
+        off = off + 2
+    elif linktype == linktype_linux_sll:
+        if len(frame) < 16:
+            return None
+        ethertype = frame[14] << 8 | frame[15]
+        off = 16
+    elif linktype in (linktype_raw, linktype_ipv4, linktype_ipv6):
+        if len(frame) < 1:
+            return None
+        ethertype = 0x0800 if frame[0] >> 4 == 4 else 0x86dd
+        off = 0
+    else:
+        return None
+
+    if ethertype == 0x0800:
+        if len(frame) < off + 20:
+            return None
+        ihl = (frame[off] & 0x0f) * 4
+        total = frame[off+2] << 8 | frame[off+3]
+        if (frame[off+6] << 8 | frame[off+7]) & 0x3fff: # more fragments or fragment offset
+            return None
+        protocol = frame[off+9]
+        src = bytes(frame[off+12:off+16])
+        dst = bytes(frame[off+16:off+20])
+        end = min(off + total, len(frame)) if total else len(frame) # drop the ethernet padding
+        off = off + ihl
+    elif ethertype == 0x86dd:
+        if len(frame) < off + 40:
+            return None
+        length = frame[off+4] << 8 | frame[off+5]
+        protocol = frame[off+6]
+        src = bytes(frame[off+8:off+24])
+        dst = bytes(frame[off+24:off+40])
+        end = min(off + 40 + length, len(frame))
+        off = off + 40
+        while protocol in (0, 43, 60, 44) and off + 8 <= end: # extension headers
+            nxt, hlen = frame[off], frame[off+1]
+            if protocol == 44: # fragment header, fixed size: only an atomic fragment is a whole packet
+                if (frame[off+2] << 8 | frame[off+3]) & 0xfff9:
+                    return None
+                off = off + 8
+            else:
+                off = off + (hlen + 1) * 8
+            protocol = nxt
+    else:
+        return None
+
+    if protocol == 6:
+        if end < off + 20:
+            return None
+        header_len = (frame[off+12] >> 4) * 4
+    elif protocol == 17:
+        if end < off + 8:
+            return None
+        header_len = 8
+    else:
+        return None
+    sport = frame[off] << 8 | frame[off+1]
+    dport = frame[off+2] << 8 | frame[off+3]
+    return Flow(protocol, src, sport, dst, dport), frame[off+header_len:end]
+
+
+class PayloadScanner():
+
+    def __init__(self, patterns, max_flows = 1 << 16):
+        self.patterns = [bytes(p) for p in patterns]
+        for p in self.patterns:
+            assert len(p) > 0
+        self.factorizations = [critical_factorization(p) for p in self.patterns]
+        self.keep = max(len(p) for p in self.patterns) - 1
+        self.flows = OrderedDict() # flow -> [tail, bytes seen], least recently used first
+        self.max_flows = max_flows
+        self.packets = 0
+        self.bytes = 0
+
+    def scan_payload(self, flow, payload, timestamp = 0.0):
+        packet = self.packets
+        self.packets = self.packets + 1
+        self.bytes = self.bytes + len(payload)
+        state = self.flows.get(flow)
+        if state == None:
+            state = [b'', 0]
+            self.flows[flow] = state
+            if len(self.flows) > self.max_flows:
+                self.flows.popitem(last = False)
+        else:
+            self.flows.move_to_end(flow)
+        tail, seen = state
+        hits = []
+        for pid, p in enumerate(self.patterns):
+            f = self.factorizations[pid]
+            m = len(p)
+            if tail and m > 1:
+                # matches that start in the tail and end in this payload
+                t = tail[len(tail) - min(len(tail), m - 1):]
+                junction = t + bytes(payload[:m-1])
+                for pos in iter_two_way(junction, p, f):
+                    if pos >= len(t):
+                        break
+                    hits.append(Hit(pid, flow, packet, seen - len(t) + pos, timestamp))
+            for pos in iter_two_way(payload, p, f):
+                hits.append(Hit(pid, flow, packet, seen + pos, timestamp))
+        if self.keep > 0:
+            if len(payload) >= self.keep:
+                tail = bytes(payload[len(payload) - self.keep:])
+            else:
+                tail = (tail + bytes(payload))[-self.keep:]
+        state[0] = tail
+        state[1] = seen + len(payload)
+        return hits
+
+    def scan_pcap(self, path):
+        with open(path, 'rb') as f:
+            for timestamp, linktype, frame in read_pcap(f):
+                parsed = parse_frame(linktype, frame)
+                if parsed == None:
+                    continue
+                flow, payload = parsed
+                if len(payload) == 0:
+                    continue
+                for hit in self.scan_payload(flow, payload, timestamp):
+                    yield hit
+
+
+def scan_pcap(path, patterns):
+    return PayloadScanner(patterns).scan_pcap(path)
+
+def format_flow(flow):
+    import ipaddress
+    proto = {6: 'tcp', 17: 'udp'}.get(flow.protocol, str(flow.protocol))
+    return '%s %s:%d -> %s:%d' % (proto, ipaddress.ip_address(flow.src), flow.sport, ipaddress.ip_address(flow.dst), flow.dport)
+
+
+def write_pcap(path, packets):
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, linktype_ethernet))
+        for ts, frame in packets:
+            f.write(struct.pack('<IIII', int(ts), int((ts % 1) * 1e6), len(frame), len(frame)))
+            f.write(frame)
+
+def make_tcp_frame(src, dst, sport, dport, payload):
+    ip_len = 20 + 20 + len(payload)
+    ether = b'\x00\x11\x22\x33\x44\x55\x66\x77\x88\x99\xaa\xbb\x08\x00'
+    ip = struct.pack('>BBHHHBBH4s4s', 0x45, 0, ip_len, 0, 0x4000, 64, 6, 0, bytes(src), bytes(dst))
+    tcp = struct.pack('>HHIIBBHHH', sport, dport, 0, 0, 5 << 4, 0x18, 65535, 0, 0)
+    return ether + ip + tcp + payload
+
+
+if __name__ == "__main__":
+    import os
+    import random
+    import sys
+    import tempfile
+    import time
+
+    if len(sys.argv) > 2:
+        pattern = bytes.fromhex(sys.argv[2]) if '--hex' in sys.argv else sys.argv[2].encode()
+        for hit in scan_pcap(sys.argv[1], [pattern]):
+            print('packet %d %s flow offset %d' % (hit.packet, format_flow(hit.flow), hit.flow_offset))
+        sys.exit(0)
+
+    # synthetic capture: 4 TCP flows carrying random payloads in 1400 byte segments,
+    # the signature (a packet payload of the test of two_way_matching.py) is planted across segments
+    rnd = random.Random(1)
+    signature = bytes.fromhex('0c5b8f279a64baabbe3400000800450005dc41bb40003f067f43ac100001c0a808641451a468fcae454ec839eaa48010020099ce00000101080aabbe4332af25f32e74fdbb775d6f7dd3a2aa2f0feefce436e601fca0d0b135ccd48229d3cf57a043545bbbb1ca38846ce2b47bd0b060079661')
+    streams = []
+    for k in range(4):
+        data = bytearray(rnd.getrandbits(8) for _ in range(1 << 20))
+        for pos in range(1000 + k * 7, len(data) - len(signature), 150001):
+            data[pos:pos+len(signature)] = signature
+        streams.append(data)
+    packets = []
+    for off in range(0, 1 << 20, 1400):
+        for k, data in enumerate(streams):
+            frame = make_tcp_frame([10, 0, 0, 1], [10, 0, 0, 2 + k], 40000 + k, 443, bytes(data[off:off+1400]))
+            packets.append((1700000000 + len(packets) * 1e-5, frame))
+    path = os.path.join(tempfile.mkdtemp(), 'capture.pcap')
+    write_pcap(path, packets)
+
+    scanner = PayloadScanner([signature])
+    start = time.perf_counter()
+    hits = list(scanner.scan_pcap(path))
+    elapsed = time.perf_counter() - start
+    expected = sorted((k, pos) for k, data in enumerate(streams) for pos in range(len(data)) if data.startswith(signature, pos))
+    assert sorted((h.flow.dst[3] - 2, h.flow_offset) for h in hits) == expected
+    for hit in hits[:4]:
+        print('packet %d %s flow offset %d' % (hit.packet, format_flow(hit.flow), hit.flow_offset))
+    print('%d hits in %d packets, %.1f MB in %.2f s (%.1f MB/s, %.0f packets/s)' % (len(hits), scanner.packets,
+        scanner.bytes / 1e6, elapsed, scanner.bytes / 1e6 / elapsed, scanner.packets / elapsed))
+    os.remove(path)
+
+    # fragments are skipped: the signature right after the IP header of non-initial fragments,
+    # where a TCP header would be, and a first fragment (MF set) carrying it in its payload
+    ether = b'\x00\x11\x22\x33\x44\x55\x66\x77\x88\x99\xaa\xbb'
+    def ipv4_fragment(flags_frag, data):
+        return ether + b'\x08\x00' + struct.pack('>BBHHHBBH4s4s', 0x45, 0, 20 + len(data), 7, flags_frag, 64, 6, 0,
+            bytes([10, 0, 0, 1]), bytes([10, 0, 0, 9])) + data
+    def ipv6_fragment(offset_m, data):
+        return ether + b'\x86\xdd' + struct.pack('>IHBB16s16s', 6 << 28, 8 + len(data), 44, 64, bytes(15) + b'\x01',
+            bytes(15) + b'\x02') + struct.pack('>BBHI', 6, 0, offset_m, 7) + data
+    fragments = [ipv4_fragment(0x2000, make_tcp_frame([10, 0, 0, 1], [10, 0, 0, 9], 1, 2, signature)[34:]),
+                 ipv4_fragment(185, signature), ipv4_fragment(0x2000 | 185, signature),
+                 ipv6_fragment(185 << 3, signature), ipv6_fragment(1, signature)]
+    for frame in fragments:
+        assert parse_frame(linktype_ethernet, memoryview(frame)) == None
+    assert parse_frame(linktype_ethernet, memoryview(ipv4_fragment(0x4000, signature))) != None # DF only, whole
+    assert parse_frame(linktype_ethernet, memoryview(ipv6_fragment(0, signature))) != None # atomic fragment
+    write_pcap(path, [(1700000000 + k, frame) for k, frame in enumerate(fragments)])
+    assert list(PayloadScanner([signature]).scan_pcap(path)) == []
+    os.remove(path)
+    print('%d fragments skipped' % len(fragments))
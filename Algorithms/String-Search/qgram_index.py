@@ -0,0 +1,147 @@
+'''
+    q-gram inverted index over a collection of documents, to search a pattern in the few documents
+    that can contain it instead of scanning all of them.
+    Every q-gram maps to the sorted ids of the documents that contain it (posting list), stored as
+    delta varints (varint.py), about one byte per posting. A document that contains p contains all the
+    q-grams of p, so the candidates are the intersection of their posting lists, shortest first. The
+    candidates are then verified with the compiled matchers of compiled.py, which return the offsets.
+    Patterns shorter than q have no q-gram and are verified in every document.
+    Ids are given in increasing order, so add() only appends to the posting lists. remove() forgets
+    the document at once, its ids stay in the posting lists (skipped at verification) until compact()
+    rewrites them, which is done automatically when a quarter of the postings are dead.
+'''
+
+from compiled import compile
+from results import collect
+from varint import encode_deltas, iter_deltas
+
+
+class QGramIndex():
+
+    def __init__(self, q = 3, algorithm = 'horspool'):
+        self.q = q
+        self.algorithm = algorithm
+        self.docs = {}      # doc_id -> document, only the live ones
+        self.postings = {}  # q-gram -> [delta varints of the doc ids, last doc id]
+        self.next_id = 0
+        self.removed = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def grams(self, t):
+        q = self.q
+        return set(t[j:j+q] for j in range(len(t) - q + 1))
+
+    def add(self, doc):
+        doc_id = self.next_id
+        self.next_id = doc_id + 1
+        self.docs[doc_id] = doc
+        postings = self.postings
+        for g in self.grams(doc):
+            entry = postings.get(g)
+            if entry == None:
+                postings[g] = [encode_deltas((doc_id,)), doc_id]
+            else:
+                encode_deltas((doc_id,), entry[1], entry[0])
+                entry[1] = doc_id
+        return doc_id
+
+    def remove(self, doc_id):
+        del self.docs[doc_id]
+        self.removed = self.removed + 1
+        if self.removed * 4 > len(self.docs) + self.removed:
+            self.compact()
+
+    # rewrites the posting lists without the removed documents
+    def compact(self):
+        docs = self.docs
+        postings = {}
+        for g, (data, last) in self.postings.items():
+            ids = [d for d in iter_deltas(data) if d in docs]
+            if ids:
+                postings[g] = [encode_deltas(ids), ids[-1]]
+        self.postings = postings
+        self.removed = 0
+
+    # ids of the documents that contain every q-gram of p (maybe removed ones)
+    def candidates(self, p, enough = 8):
+        grams = self.grams(p)
+        if not grams:
+            return sorted(self.docs)
+        lists = []
+        for g in grams:
+            entry = self.postings.get(g)
+            if entry == None:
+                return []
+            lists.append(entry[0])
+        lists.sort(key=len) # the byte length is a good estimate of the number of ids
+        result = list(iter_deltas(lists[0]))
+        for data in lists[1:]:
+            if len(result) <= enough: # verifying a few documents is cheaper than decoding long lists
+                break
+            keep = []
+            k = 0
+            for d in iter_deltas(data):
+                while k < len(result) and result[k] < d:
+                    k = k + 1
+                if k == len(result):
+                    break
+                if result[k] == d:
+                    keep.append(d)
+            result = keep
+        return result
+
+    def iter_search(self, p):
+        matcher = compile(p, self.algorithm)
+        docs = self.docs
+        for doc_id in self.candidates(p):
+            doc = docs.get(doc_id)
+            if doc == None or len(doc) < len(p):
+                continue
+            for pos in matcher.finditer(doc):
+                yield doc_id, pos
+
+    # (doc_id, offset) pairs, by doc_id then offset
+    def search(self, p, first_k = None, out = None):
+        return collect(self.iter_search(p), first_k, out)
+
+    def posting_bytes(self):
+        return sum(len(data) for data, _ in self.postings.values())
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from horspool import search_horspool
+
+    rnd = random.Random(1)
+    services = ['auth', 'billing', 'search', 'gateway', 'storage', 'mailer']
+    levels = ['INFO', 'WARN', 'ERROR', 'DEBUG']
+    messages = ['request served in %d ms', 'user %d logged in', 'cache miss for key k%d', 'retrying upload %d',
+                'connection reset by peer %d', 'disk usage at %d percent', 'token expired for session s%d']
+    docs = ['%s %s %s' % (rnd.choice(levels), rnd.choice(services), rnd.choice(messages) % rnd.randint(0, 1 << 20))
+            for _ in range(200000)]
+
+    index = QGramIndex()
+    start = time.perf_counter()
+    for doc in docs:
+        index.add(doc)
+    built = time.perf_counter()
+    postings = sum(len(index.grams(doc)) for doc in docs)
+    print('%d documents indexed in %.2f s, %d q-grams, %.2f bytes per posting' % (len(docs), built - start,
+        len(index.postings), index.posting_bytes() / float(postings)))
+
+    for doc_id in range(0, len(docs), 3): # remove a third of them, compact() runs on the way
+        index.remove(doc_id)
+    live = [(doc_id, doc) for doc_id, doc in enumerate(docs) if doc_id % 3 != 0]
+
+    for p in ['ERROR billing', 'connection reset by peer 4242', 'session s77', 'mailer retrying upload 1', 'INFO']:
+        start = time.perf_counter()
+        x = index.search(p)
+        indexed = time.perf_counter()
+        y = [(doc_id, pos) for doc_id, doc in live for pos in search_horspool(doc, p)]
+        scanned = time.perf_counter()
+        assert x == y
+        print('%-32s %6d matches, %6d candidates, index = %.4f s scan of every document = %.3f s' % (repr(p), len(x),
+            len(index.candidates(p)), indexed - start, scanned - indexed))
@@ -0,0 +1,205 @@
+'''
+    Compact buffers for the positions returned by the matchers.
+    In a list every position costs a pointer and an int object, about 36 bytes. Every search_*
+    function takes out=, any object with extend(), and fills it instead of building a list:
+        array('q')    8 bytes per position, memoryview(out) reads it without copy
+        NumpySink     8 bytes per position in a NumPy buffer grown by doubling (12 while it grows),
+                      view() is a view of it
+        SpillSink     blocks of delta varints (varint.py) written to a file, about 1 to 3 bytes
+                      per position, only one block is kept in memory. Read back through mmap,
+                      one block at a time.
+    The positions come out of a matcher increasing, so the gaps are small. Matchers that return
+    pairs ((pattern_id, position), (end, distance)) take a list or any sink of tuples.
+    The index queries (suffix_array.py, fm_index.py) have their positions in an ndarray already,
+    collect_array copies it into out without a Python int per position.
+'''
+
+import mmap
+import os
+from array import array
+from itertools import islice
+
+from varint import encode_deltas, iter_deltas
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# what every search_* function returns: a list, or out filled with the positions
+def collect(iterator, first_k = None, out = None):
+    if first_k != None:
+        iterator = islice(iterator, first_k)
+    if out == None:
+        return list(iterator)
+    out.extend(iterator)
+    return out
+
+# the same for positions already in an ndarray (index queries): array('q') takes its bytes at once
+def collect_array(values, first_k = None, out = None):
+    if first_k != None:
+        values = values[:first_k]
+    if out == None:
+        return values.tolist()
+    if isinstance(out, array) and out.typecode == 'q':
+        out.frombytes(values.astype(np.int64).tobytes())
+    else:
+        out.extend(values)
+    return out
+
+
+class NumpySink():
+
+    def __init__(self, capacity = 1 << 16, dtype = 'int64'):
+        self.data = np.empty(capacity, dtype=dtype)
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def reserve(self, extra):
+        if self.n + extra > len(self.data):
+            data = np.empty(max(2 * len(self.data), self.n + extra), dtype=self.data.dtype)
+            data[:self.n] = self.data[:self.n]
+            self.data = data
+
+    def append(self, x):
+        self.reserve(1)
+        self.data[self.n] = x
+        self.n = self.n + 1
+
+    def extend(self, values, block_size = 1 << 16):
+        if isinstance(values, np.ndarray) or isinstance(values, array):
+            values = np.asarray(values)
+            self.reserve(len(values))
+            self.data[self.n:self.n+len(values)] = values
+            self.n = self.n + len(values)
+            return
+        values = iter(values)
+        while True:
+            block = array('q', islice(values, block_size))
+            if not block:
+                return
+            self.extend(block)
+
+    def view(self):
+        return self.data[:self.n]
+
+
+class SpillSink():
+
+    def __init__(self, path, block_size = 1 << 16):
+        self.path = path
+        self.block_size = block_size
+        self.f = open(path, 'wb')
+        self.buffer = array('q')
+        self.index = [] # (file offset, bytes, positions, first position) of every block on disk
+        self.size = 0
+        self.n = 0
+        self.last = None
+
+    def __len__(self):
+        return self.n
+
+    def append(self, x):
+        self.buffer.append(x)
+        self.n = self.n + 1
+        if len(self.buffer) >= self.block_size:
+            self.spill()
+
+    def extend(self, values):
+        values = iter(values)
+        while True:
+            before = len(self.buffer)
+            self.buffer.extend(islice(values, self.block_size - before))
+            self.n = self.n + len(self.buffer) - before
+            if len(self.buffer) < self.block_size:
+                return
+            self.spill()
+
+    def spill(self):
+        block = self.buffer
+        if not block:
+            return
+        if self.last != None and block[0] < self.last:
+            raise ValueError('SpillSink needs increasing positions')
+        data = encode_deltas(block[1:], block[0]) # append_varint asserts on a decreasing position
+        self.f.write(data)
+        self.index.append((self.size, len(data), len(block), block[0]))
+        self.size = self.size + len(data)
+        self.last = block[-1]
+        self.buffer = array('q')
+
+    def close(self):
+        if self.f != None:
+            self.spill()
+            self.f.close()
+            self.f = None
+
+    def blocks(self):
+        self.close()
+        if self.size == 0: # only blocks of one position, their first one is in the index
+            for offset, size, count, first in self.index:
+                yield array('q', [first])
+            return
+        with open(self.path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mm)
+        try:
+            for offset, size, count, first in self.index:
+                block = array('q', [first])
+                block.extend(iter_deltas(view[offset:offset+size], first))
+                yield block
+        finally:
+            view.release()
+            mm.close()
+
+    def __iter__(self):
+        for block in self.blocks():
+            for x in block:
+                yield x
+
+    def remove(self):
+        self.close()
+        os.remove(self.path)
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    import tracemalloc
+    from horspool import search_horspool_bytes
+
+    # dense matches: every position of a periodic text
+    n = 1 << 19
+    t = b'a' * n
+    p = b'aaaa'
+    expected = n - len(p) + 1
+    path = os.path.join(tempfile.mkdtemp(), 'positions.spill')
+    sinks = [('list', lambda: None), ("array('q')", lambda: array('q'))]
+    if np != None:
+        sinks.append(('NumpySink', NumpySink))
+    sinks.append(('SpillSink', lambda: SpillSink(path)))
+    for name, make in sinks:
+        tracemalloc.start()
+        start = time.perf_counter()
+        out = search_horspool_bytes(t, p, out = make())
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert len(out) == expected
+        line = '%-11s %d positions in %.2f s, peak memory = %5.2f bytes per position' % (name, len(out), elapsed,
+            peak / float(expected))
+        if isinstance(out, SpillSink):
+            out.close()
+            line = line + ', file = %.2f bytes per position' % (out.size / float(expected))
+            assert sum(1 for _ in out) == expected
+            out.remove()
+        print(line)
+
+    # one match, and blocks of one position: those positions are only in the index of the blocks
+    for p, block_size, expected in ((b'xabcdx', 1 << 16, [3]), (b'abcd', 1, [4, 12])):
+        out = search_horspool_bytes(b'xxxxabcdxxxxabcd', p, out = SpillSink(path, block_size))
+        assert list(out) == expected
+        out.remove()
@@ -0,0 +1,128 @@
+'''
+    asyncio scanner: match patterns inline over many asyncio.StreamReader connections.
+    One automaton (Aho-Corasick for a set of patterns, KMP for a single one) is shared by all the
+    connections, every connection only keeps its own state (the node q and the offset), so a
+    match split between two reads, or two TCP segments, is still found.
+    Every chunk is scanned synchronously (it is pure CPU work) and the scanner gives the event loop
+    back between chunks, so chunk_size bounds how long the other connections wait.
+    Matches are given to a callback or produced by an async iterator.
+'''
+
+import asyncio
+
+from aho_corasick import AhoCorasick, AhoCorasickStream
+from knuth_morris_prat import StreamingKMP, kmp_prefix_func
+
+
+class StreamScanner():
+
+    def __init__(self, patterns, chunk_size = 1 << 16):
+        self.patterns = list(patterns)
+        self.chunk_size = chunk_size
+        if len(self.patterns) == 1:
+            self.prefix = kmp_prefix_func(self.patterns[0])
+            self.automaton = None
+        else:
+            self.automaton = AhoCorasick(self.patterns)
+
+    # per connection state, feed(chunk) returns the (pattern_id, position) of the chunk
+    def new_state(self):
+        if self.automaton != None:
+            return AhoCorasickStream(self.automaton)
+        kmp = StreamingKMP(self.patterns[0], self.prefix)
+        return KmpState(kmp)
+
+    async def matches(self, reader):
+        state = self.new_state()
+        while True:
+            chunk = await reader.read(self.chunk_size)
+            if not chunk:
+                return
+            for hit in state.feed(chunk):
+                yield hit
+            await asyncio.sleep(0) # let the other connections run
+
+    # returns the number of matches, callback(pattern_id, position) for every one
+    async def scan(self, reader, callback = None):
+        count = 0
+        async for pid, pos in self.matches(reader):
+            count = count + 1
+            if callback != None:
+                callback(pid, pos)
+        return count
+
+
+class KmpState():
+
+    def __init__(self, kmp):
+        self.kmp = kmp
+
+    def feed(self, chunk):
+        return [(0, pos) for pos in self.kmp.feed(chunk)]
+
+
+'''
+    Load test: a local stand-in server ingests the connections and scans them, a load generator
+    opens many connections that send random text with planted patterns. It reports hits per
+    second and the memory allocated per connection (tracemalloc).
+'''
+async def load_test(connections = 200, bytes_per_connection = 1 << 16, write_size = 1460, seed = 1):
+    import random
+    import time
+    import tracemalloc
+
+    rnd = random.Random(seed)
+    patterns = [b'GET /admin', b'cmd.exe', b'/etc/passwd', b'SELECT * FROM', b'<script>']
+    scanner = StreamScanner(patterns)
+    payloads = []
+    expected = 0
+    for _ in range(connections):
+        data = bytearray(rnd.choice(b'abcdefghijklmnopqrstuvwxyz ') for _ in range(bytes_per_connection))
+        for pos in range(rnd.randint(0, 500), len(data) - 16, 997):
+            p = rnd.choice(patterns)
+            data[pos:pos+len(p)] = p
+            expected = expected + 1
+        payloads.append(bytes(data))
+
+    hits = [0]
+    done = asyncio.Event()
+    finished = [0]
+
+    def on_hit(pid, pos):
+        hits[0] = hits[0] + 1
+
+    async def handle(reader, writer):
+        await scanner.scan(reader, on_hit)
+        writer.close()
+        finished[0] = finished[0] + 1
+        if finished[0] == connections:
+            done.set()
+
+    async def client(port, data):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        for i in range(0, len(data), write_size):
+            writer.write(data[i:i+write_size])
+            await writer.drain()
+        writer.close()
+
+    tracemalloc.start()
+    server = await asyncio.start_server(handle, '127.0.0.1', 0, limit=1 << 16)
+    port = server.sockets[0].getsockname()[1]
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    await asyncio.gather(*[client(port, data) for data in payloads])
+    await done.wait()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    server.close()
+    await server.wait_closed()
+
+    assert hits[0] == expected
+    print('%d connections, %.1f MB in %.2f s: %.0f hits/s, %.1f MB/s, peak memory per connection %.1f KB' % (connections,
+        connections * bytes_per_connection / 1e6, elapsed, hits[0] / elapsed, connections * bytes_per_connection / 1e6 / elapsed,
+        (peak - before) / 1024.0 / connections))
+
+
+if __name__ == "__main__":
+    asyncio.run(load_test())
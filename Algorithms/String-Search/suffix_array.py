@@ -0,0 +1,207 @@
+'''
+    Suffix array + LCP array of a fixed text, built once and queried many times
+    Paper: Udi Manber and Gene Myers. 1993. Suffix arrays: a new method for on-line string searches. SIAM J. Comput. 22, 5, 935-948.
+    Paper: T. Kasai, G. Lee, H. Arimura, S. Arikawa, K. Park. 2001. Linear-Time Longest-Common-Prefix Computation in Suffix Arrays and Its Applications. CPM 2001.
+    sa[i] is the start of the i-th smallest suffix of t, so all the occurrences of a pattern are a
+    contiguous range of sa, found with two binary searches: O(m log n) per query, whatever the
+    number of occurrences. lcp[i] is the longest common prefix of the suffixes sa[i-1] and sa[i].
+    Construction by prefix doubling with NumPy: after the round k the suffixes are sorted by their
+    first 2k chars, ranks are the pair (rank[i], rank[i+k]) of the previous round, O(n log^2 n).
+    The order by the second half comes from sa itself (radix sort by halves), so every round is one
+    sort of int64 keys (rank << 32 | index) in place. The arrays are int32 (4 bytes per char) when
+    the text is shorter than 2^31, and the rounds reuse their buffers, the gathers and scans go one
+    block at a time. Peak memory of the construction: about 21 bytes per char (sa, rank and order
+    in int32, the int64 keys, one bool per char), about 37 above 2^31 (int64 arrays, argsort).
+    The queries only need sa, the LCP is built on request (with_lcp=True): Kasai's loop is
+    sequential and runs in Python, it reads sa and its inverse through memoryviews, so it only adds
+    the inverse array.
+'''
+
+import sys
+
+import numpy as np
+
+from results import collect_array
+
+
+block_size = 1 << 16
+
+
+def index_dtype(n):
+    return np.int32 if n < (1 << 31) - 1 else np.int64
+
+# out[i] = a[indices[i]] one block at a time: np.take would first copy all the indices to intp
+def take_into(a, indices, out):
+    for start in range(0, len(indices), block_size):
+        out[start:start+block_size] = a[indices[start:start+block_size]]
+
+def build_suffix_array(t):
+    s = np.frombuffer(t, dtype=np.uint8)
+    n = len(s)
+    dtype = index_dtype(n)
+    if n == 0:
+        return np.zeros(0, dtype=dtype)
+    sa = np.argsort(s, kind='stable').astype(dtype)
+    rank = s.astype(dtype) # the byte values, dense ranks after the first round
+    order = np.empty(n, dtype=dtype)
+    packed = np.empty(n, dtype=np.int64) if dtype == np.int32 else None
+    low = None if packed is None else packed.view(np.uint32)[(0 if sys.byteorder == 'little' else 1)::2]
+    diff = np.empty(n, dtype=bool)
+    k = 1
+    while True:
+        # suffixes by their second half: the ones shorter than k + 1 first (empty second half),
+        # then sa shifted by k, already sorted by rank[i+k]
+        for start in range(0, k, block_size):
+            stop = min(start + block_size, k)
+            order[start:stop] = np.arange(n - k + start, n - k + stop, dtype=dtype)
+        end = k
+        for start in range(0, n, block_size):
+            block = sa[start:start+block_size]
+            block = block[block >= k]
+            order[end:end+len(block)] = block - k
+            end = end + len(block)
+        # stable sort of order by the first half, sa holds the first halves until it is rebuilt
+        take_into(rank, order, sa)
+        if packed is not None: # (rank, index in order) in one int64, sorted in place
+            np.left_shift(sa, 32, out=packed, dtype=np.int64)
+            for start in range(0, n, block_size):
+                low[start:start+block_size] = np.arange(start, min(start + block_size, n), dtype=np.uint32)
+            packed.sort()
+            take_into(order, low, sa)
+        else:
+            perm = np.argsort(sa, kind='stable')
+            take_into(order, perm, sa)
+            del perm
+        # a suffix starts a new rank if its pair (rank[i], rank[i+k]) differs from the previous one
+        second = order # order is free, it holds rank[i+k] (-1 past the end)
+        second[:n-k] = rank[k:]
+        second[n-k:] = -1
+        diff[0] = False
+        for start in range(0, n, block_size):
+            lo = max(start - 1, 0)
+            rows = sa[lo:start+block_size]
+            x = rank[rows]
+            y = second[rows]
+            diff[lo+1:lo+len(rows)] = (x[1:] != x[:-1]) | (y[1:] != y[:-1])
+        total = 0
+        for start in range(0, n, block_size): # new ranks, a cumsum one block at a time
+            block = np.cumsum(diff[start:start+block_size], dtype=dtype)
+            block += total
+            total = int(block[-1])
+            second[start:start+len(block)] = block
+        rank[sa] = second
+        if total == n - 1: # all the ranks are different
+            break
+        k = 2 * k
+    return sa
+
+# Kasai: the lcp of the suffix i+1 with its predecessor is at least lcp(i) - 1
+def build_lcp(t, sa):
+    n = len(sa)
+    rank = np.empty(n, dtype=sa.dtype)
+    rank[sa] = np.arange(n, dtype=sa.dtype)
+    rank = memoryview(rank)
+    sa_list = memoryview(sa)
+    lcp = np.zeros(n, dtype=sa.dtype)
+    h = 0
+    for i in range(n):
+        r = rank[i]
+        if r > 0:
+            j = sa_list[r-1]
+            while i + h < n and j + h < n and t[i+h] == t[j+h]:
+                h = h + 1
+            lcp[r] = h
+            if h > 0:
+                h = h - 1
+        else:
+            h = 0
+    return lcp
+
+
+class SuffixArrayIndex():
+
+    def __init__(self, t, with_lcp = False):
+        if isinstance(t, memoryview):
+            t = t.cast('B')
+        elif not isinstance(t, bytes):
+            t = bytes(t) # a bytearray could change under the index
+        self.t = t
+        self.sa = build_suffix_array(self.t)
+        self.lcp = build_lcp(self.t, self.sa) if with_lcp else None
+
+    # the first m chars of the suffix s, as bytes to compare with p
+    def prefix(self, s, m):
+        x = self.t[s:s+m]
+        if isinstance(x, memoryview):
+            return x.tobytes()
+        return x
+
+    # [lo, hi) range of sa whose suffixes start with p
+    def range(self, p):
+        prefix = self.prefix
+        sa = self.sa
+        m = len(p)
+        lo = 0
+        hi = len(sa)
+        while lo < hi: # first suffix >= p
+            mid = (lo + hi) // 2
+            s = int(sa[mid])
+            if prefix(s, m) < p:
+                lo = mid + 1
+            else:
+                hi = mid
+        start = lo
+        hi = len(sa)
+        while lo < hi: # first suffix that does not start with p
+            mid = (lo + hi) // 2
+            s = int(sa[mid])
+            if prefix(s, m) <= p:
+                lo = mid + 1
+            else:
+                hi = mid
+        return start, lo
+
+    def count(self, p):
+        lo, hi = self.range(p)
+        return hi - lo
+
+    # positions in text order, first_k = the leftmost ones, without sorting all of them
+    def occurrences(self, p, first_k = None, out = None):
+        lo, hi = self.range(p)
+        found = self.sa[lo:hi]
+        if first_k != None and first_k < len(found):
+            found = np.partition(found, first_k - 1)[:first_k] if first_k > 0 else found[:0]
+        return collect_array(np.sort(found), None, out)
+
+    def first_k(self, p, k, out = None):
+        return self.occurrences(p, k, out)
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from horspool import search_horspool_bytes
+
+    t = b'AIABBABABRQMYOAABBBBABABYOSGBBGTVBHABBABABSUJKSKKHKJABBABBABABABAYRQMYOIUHKJHJHSDASDASDNIAURTO ABBABABNLK'
+    index = SuffixArrayIndex(t)
+    for pos in index.occurrences(b'ABBABAB'):
+        print('Pattern found at position = ' + str(pos))
+
+    rnd = random.Random(1)
+    n = 1 << 20
+    t = bytes(rnd.choice(b'ACGT') for _ in range(n))
+    patterns = [t[pos:pos+m] for pos, m in ((rnd.randint(0, n - 32), rnd.choice((8, 12, 16, 32))) for _ in range(200))]
+
+    start = time.perf_counter()
+    index = SuffixArrayIndex(t, with_lcp = False)
+    built = time.perf_counter()
+    index.lcp = build_lcp(index.t, index.sa)
+    lcp_built = time.perf_counter()
+    res_index = [index.occurrences(p) for p in patterns]
+    queried = time.perf_counter()
+    res_horspool = [search_horspool_bytes(t, p) for p in patterns]
+    scanned = time.perf_counter()
+
+    assert res_index == res_horspool
+    print('n = %d suffix array = %.2f s lcp = %.2f s, %d bytes per char' % (n, built - start, lcp_built - built, index.sa.itemsize + index.lcp.itemsize))
+    print('%d queries: index = %.4f s horspool = %.2f s' % (len(patterns), queried - lcp_built, scanned - queried))
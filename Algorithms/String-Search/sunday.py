@@ -2,6 +2,12 @@
     Naive Sunday implementation for searching matches in a string 
     Paper: Daniel M. Sunday. 1990. A very fast substring search algorithm. Commun. ACM 33, 8 (Aug. 1990), 132-142.
 '''
+
+from array import array
+
+from horspool import qgram_bits, qgram_hash, qgram_table
+from results import collect
+
 def pre_process_sunday(p):
     m = len(p) 
     alphabet_lenght = 1024
@@ -10,25 +16,112 @@ def pre_process_sunday(p):
         x[ord(p[i])] = m - i
     return x
 
-def search_sunday(t,p):
-    td = pre_process_sunday(p)
+def iter_sunday(t,p, td = None):
+    if td == None:
+        td = pre_process_sunday(p)
     n = len(t)
     m = len(p)
     k  = 0
     i = 0
-    x = []
-    while i < n - m:
+    while i <= n - m:
         if t[i+k] != p[k]:
             k = 0
+            if i + m == n: # no char after the last window
+                break
             i = i + td[ord(t[i+m])]
         else:
             k = k + 1
             if k == m:
-                x.append(i)
+                yield i
                 k = 0
+                if i + m == n:
+                    break
                 i = i + td[ord(t[i+m])]
+
+def search_sunday(t,p, td = None, first_k = None, out = None):
+    return collect(iter_sunday(t, p, td), first_k, out)
+
+def count_sunday(t,p, td = None):
+    return sum(1 for _ in iter_sunday(t, p, td))
+
+
+# Bytes mode (mmap_search.py): shift[c] for the byte after the window, 256 slots, windows in t[start:end]
+def pre_process_sunday_bytes(p):
+    m = len(p)
+    x = array('l', [m+1]) * 256
+    for i in range(m):
+        x[p[i]] = m - i
     return x
 
+def iter_sunday_bytes(t, p, shift = None, start = 0, end = None):
+    if shift == None:
+        shift = pre_process_sunday_bytes(p)
+    if end == None:
+        end = len(t)
+    n = end
+    m = len(p)
+    i = start
+    while i <= n - m:
+        k = 0
+        while k < m and t[i+k] == p[k]:
+            k = k + 1
+        if k == m:
+            yield i
+        if i + m == n: # no char after the window
+            break
+        i = i + shift[t[i+m]]
+
+def search_sunday_bytes(t, p, shift = None, start = 0, end = None, first_k = None, out = None):
+    return collect(iter_sunday_bytes(t, p, shift, start, end), first_k, out)
+
+def count_sunday_bytes(t, p, shift = None, start = 0, end = None):
+    return sum(1 for _ in iter_sunday_bytes(t, p, shift, start, end))
+
+
+'''
+    q-gram shifts, same hashed table as pre_process_horspool_qgram but, as in Sunday, the q-gram read
+    is the one that ends just after the window, t[i+m-q+1:i+m+1]. It is aligned with p[j:j+q] after a
+    shift of m - q + 1 - j, a q-gram that is not in p moves the window by m - q + 2.
+'''
+def pre_process_sunday_qgram(p, q = 2):
+    m = len(p)
+    assert m >= q
+    size = 1 << qgram_bits(q)
+    x = qgram_table(m - q + 2, size)
+    for j in range(m - q + 1):
+        x[qgram_hash(p[j:j+q], size - 1)] = m - q + 1 - j
+    return x
+
+def iter_sunday_qgram(t, p, shift = None, q = 2, start = 0, end = None):
+    if shift == None:
+        shift = pre_process_sunday_qgram(p, q)
+    if end == None:
+        end = len(t)
+    n = end
+    m = len(p)
+    mask = (1 << qgram_bits(q)) - 1
+    i = start
+    while i <= n - m:
+        if t[i+m-1] == p[m-1]:
+            k = 0
+            while k < m and t[i+k] == p[k]:
+                k = k + 1
+            if k == m:
+                yield i
+        if i + m == n: # no char after the window
+            break
+        h = 0
+        for c in t[i+m-q+1:i+m+1]:
+            h = (h << 5) ^ c
+        i = i + shift[h & mask]
+
+def search_sunday_qgram(t, p, shift = None, q = 2, start = 0, end = None, first_k = None, out = None):
+    return collect(iter_sunday_qgram(t, p, shift, q, start, end), first_k, out)
+
+def count_sunday_qgram(t, p, shift = None, q = 2, start = 0, end = None):
+    return sum(1 for _ in iter_sunday_qgram(t, p, shift, q, start, end))
+
+
 if __name__ == "__main__":
     t = 'AIABBABABRQMYOAABBBBABABYOSGBBGTVBHABBABABSUJKSKKHKJABBABBABABABAYRQMYOIUHKJHJHSDASDASDNIAURTO ABBABABNLK'
     p = 'ABBABAB'
@@ -37,7 +130,15 @@ if __name__ == "__main__":
 #    p = 'ABBABAB'
     positions = search_sunday(t,p)
     for p in positions:
-        print 'Pattern found at position = ' + str(p)
+        print('Pattern found at position = ' + str(p))
+
+    positions = search_sunday_bytes(t.encode(), b'ABBABAB')
+    for p in positions:
+        print('Pattern found at position = ' + str(p) + ' (bytes)')
+
+    positions = search_sunday_qgram(t.encode(), b'ABBABAB')
+    for p in positions:
+        print('Pattern found at position = ' + str(p) + ' (bigrams)')
 
 
 
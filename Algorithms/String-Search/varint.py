@@ -0,0 +1,59 @@
+'''
+    Variable length integers (LEB128): 7 bits per byte, low bits first, the high bit is set on every
+    byte but the last one. A sorted list of integers is stored as the varints of its gaps
+    (delta encoding): the gaps of dense lists are small and take a single byte.
+'''
+
+
+def append_varint(out, x):
+    assert x >= 0
+    while x >= 0x80:
+        out.append((x & 0x7f) | 0x80)
+        x = x >> 7
+    out.append(x)
+
+def iter_varints(data):
+    x = 0
+    shift = 0
+    for b in data:
+        x = x | ((b & 0x7f) << shift)
+        if b < 0x80:
+            yield x
+            x = 0
+            shift = 0
+        else:
+            shift = shift + 7
+    if shift:
+        raise ValueError('truncated varint')
+
+# values must be increasing and >= previous
+def encode_deltas(values, previous = 0, out = None):
+    if out == None:
+        out = bytearray()
+    for x in values:
+        append_varint(out, x - previous)
+        previous = x
+    return out
+
+def iter_deltas(data, previous = 0):
+    for gap in iter_varints(data):
+        previous = previous + gap
+        yield previous
+
+def decode_deltas(data, previous = 0):
+    return list(iter_deltas(data, previous))
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    rnd = random.Random(1)
+    values = sorted(rnd.sample(range(1 << 24), 1 << 18))
+    start = time.perf_counter()
+    data = encode_deltas(values)
+    encoded = time.perf_counter()
+    assert decode_deltas(data) == values
+    decoded = time.perf_counter()
+    print('%d sorted ids: %.2f bytes per id (8 as int64), encode = %.3f s decode = %.3f s' % (len(values),
+        len(data) / float(len(values)), encoded - start, decoded - encoded))